@@ -6,6 +6,5 @@ class AppConfig(AppConfig):
     name = 'app'
 
     def ready(self):
-        '''start scheduler'''
-        from app import schedular
-        schedular.run_schedular()
+        '''connect signals; payment reconciliation runs in its own process, see run_payment_worker'''
+        from app import signals  # noqa: F401
@@ -1,16 +1,20 @@
 from django.db.models import Q
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
 
-from rest_framework import status, serializers
+from rest_framework import exceptions, status, serializers
 from rest_framework_simplejwt.views import TokenViewBase
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
 
 from app.services.api_response import generic_response
 
 
 class TokenObtainSerializer(TokenObtainPairSerializer):
     """
-    Overriding TokenObtainPairSerializer for email verification before obtaining JWT tokens (access and refresh).
+    Overriding TokenObtainPairSerializer to log in with email or username.
+    The user is looked up once and the password hashed once; super().validate() would authenticate
+    again through the authentication backends, i.e. a second lookup and a second full password hash.
     """
 
     def validate(self, attrs):
@@ -28,8 +32,17 @@ class TokenObtainSerializer(TokenObtainPairSerializer):
             raise serializers.ValidationError({
                 "message": "Invalid Password!"
             })
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages["no_active_account"],
+                "no_active_account",
+            )
 
-        return super().validate(attrs)
+        refresh = self.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
 
 
 class TokenObtainPairView(TokenViewBase):
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from app.models import ParkSlot
+from app.services.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute ParkSlot.rating_avg/rating_count from the Rating table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(ParkSlot.objects.order_by('id').values_list('id', flat=True))
+
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            updated += rebuild_rating_aggregates(ParkSlot.objects.filter(id__range=(batch[0], batch[-1])))
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} park slots.'))
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.models import Booking, ParkSlot, User
+from app.services.availability import blocking_bookings, double_booked
+from app.services.benchmark import (
+    HttpTransport, InProcessTransport, Recorder, default_report_path, run_concurrently, write_report)
+from app.services.fake_gateway import FakeKhaltiGateway
+
+
+class Command(BaseCommand):
+    help = (
+        'Book overlapping windows of a few park slots from many threads at once, check that no two '
+        'bookings of a slot overlap and report throughput and latency as JSON. Bookings are made ten '
+        'years ahead and deleted afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--slots', type=int, default=4, help='How many slots all threads compete for.')
+        parser.add_argument('--hours', type=int, default=12,
+                            help='Requested windows of 1-3 hours all fall within this many hours.')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--base-url', help='Benchmark a running server instead of this process. '
+                                               'Start it with KHALTI_BASE_URL pointing at fake_gateway.')
+        parser.add_argument('--timeout', type=float, default=30, help='Per request timeout with --base-url.')
+        parser.add_argument('--gateway-latency-ms', type=float, default=50,
+                            help='Latency of the in-process fake payment gateway.')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--keep', action='store_true', help='Keep the bookings made by the run.')
+        parser.add_argument('--output', help='Report path (default bench_booking-<timestamp>.bench.json).')
+
+    def handle(self, *args, **options):
+        slot_ids = list(ParkSlot.objects.order_by('?').values_list('id', flat=True)[:options['slots']])
+        customers = User.objects.filter(role_type='user', is_active=True).order_by('?')[:options['users']]
+        tokens = [str(RefreshToken.for_user(user).access_token) for user in customers]
+        if not slot_ids or not tokens:
+            raise CommandError('No park slots or users to book with, run generate_data first.')
+
+        day = (timezone.now() + timedelta(days=3650)).replace(hour=0, minute=0, second=0, microsecond=0)
+        hours = max(options['hours'], 3)
+        recorder = Recorder()
+
+        def book(rnd):
+            length = rnd.randint(1, 3)
+            start_time = day + timedelta(hours=rnd.randint(0, hours - length))
+            end_time = start_time + timedelta(hours=length)
+            recorder.timed('book', lambda: transport.request('POST', '/api/book/', rnd.choice(tokens), {
+                'park_slot_id': rnd.choice(slot_ids),
+                'start_time': start_time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'end_time': end_time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }))
+
+        def run():
+            return run_concurrently(
+                book, options['concurrency'], requests=options['requests'], seed=options['seed'])
+
+        if options['base_url']:
+            transport = HttpTransport(options['base_url'], options['timeout'])
+            elapsed = run()
+        else:
+            transport = InProcessTransport()
+            gateway = FakeKhaltiGateway(latency=options['gateway_latency_ms'] / 1000, seed=options['seed'])
+            with gateway, override_settings(KHALTI_BASE_URL=gateway.base_url):
+                elapsed = run()
+
+        made = Booking.objects.filter(slot_id__in=slot_ids, start_time__gte=day, end_time__lte=day + timedelta(days=1))
+        held = blocking_bookings().filter(pk__in=made.values('pk'))
+        conflicts = list(double_booked(held).values_list('id', flat=True))
+        held_hours = sum((booking.end_time - booking.start_time).total_seconds() / 3600 for booking in held)
+
+        output = options['output'] or default_report_path('bench_booking')
+        config = {key: options[key] for key in (
+            'requests', 'concurrency', 'slots', 'hours', 'users', 'base_url', 'gateway_latency_ms', 'seed')}
+        results = recorder.summary(elapsed)
+        report = write_report(
+            output, 'bench_booking', config, results, elapsed_seconds=round(elapsed, 3),
+            bookings={
+                'held': held.count(),
+                'occupancy': round(held_hours / (hours * len(slot_ids)), 3),
+                'double_booked': conflicts,
+            })
+
+        if not options['keep']:
+            made.delete()
+
+        total = report['total']
+        latency = total['latency_ms']
+        self.stdout.write(
+            f"{total['requests']} requests {total['throughput_rps']} req/s "
+            f"p50 {latency.get('p50')} p95 {latency.get('p95')} p99 {latency.get('p99')} ms "
+            f"status codes {total['status_codes']}")
+        self.stdout.write(
+            f"{report['bookings']['held']} bookings hold {report['bookings']['occupancy']:.0%} of "
+            f"{hours}h x {len(slot_ids)} slots")
+        if conflicts:
+            raise CommandError(f'{len(conflicts)} double-booked bookings: {conflicts}. Report written to {output}')
+        self.stdout.write(self.style.SUCCESS(f'No double bookings. Report written to {output}'))
@@ -0,0 +1,97 @@
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from app.core.authentication import TokenObtainPairView, TokenObtainSerializer
+from app.models import User
+from app.services.benchmark import (
+    HttpTransport, InProcessTransport, Recorder, default_report_path, run_concurrently, write_report)
+from app.services.synthetic_data import PASSWORD
+
+
+class BaselineTokenObtainSerializer(TokenObtainSerializer):
+    """
+    Login as it was before tokens were issued right after the single password check: simplejwt's
+    validate() authenticates once more through the backends, ModelBackend included.
+    """
+
+    def validate(self, attrs):
+        # the token pair issued here costs microseconds next to a password hash
+        super().validate(attrs)
+        return TokenObtainPairSerializer.validate(self, attrs)
+
+
+@contextmanager
+def baseline_login():
+    backends = [*settings.AUTHENTICATION_BACKENDS, 'django.contrib.auth.backends.ModelBackend']
+    serializer_class = TokenObtainPairView.serializer_class
+    TokenObtainPairView.serializer_class = BaselineTokenObtainSerializer
+    try:
+        with override_settings(AUTHENTICATION_BACKENDS=backends):
+            yield
+    finally:
+        TokenObtainPairView.serializer_class = serializer_class
+
+
+class Command(BaseCommand):
+    help = (
+        'Obtain JWT tokens for many users concurrently, by username and by email, with a share of wrong '
+        'passwords, and report login throughput and p50/p95/p99 latency as JSON. Password hashing is CPU '
+        'bound, so compare runs at the same --concurrency on the same machine.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--users', type=int, default=50, help='How many users log in.')
+        parser.add_argument('--password', default=PASSWORD, help='Password of those users (default generate_data\'s).')
+        parser.add_argument('--invalid-ratio', type=float, default=0.1, help='Share of logins with a wrong password.')
+        parser.add_argument('--base-url', help='Benchmark a running server instead of this process.')
+        parser.add_argument('--baseline', action='store_true',
+                            help='Log in the way it was done before, authenticating twice with a ModelBackend '
+                                 'fallback, to compare against a run without it. Only in this process.')
+        parser.add_argument('--timeout', type=float, default=30, help='Per request timeout with --base-url.')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Report path (default bench_login-<timestamp>.bench.json).')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(is_active=True).order_by('?').values_list('username', 'email')[
+            :options['users']])
+        if not users:
+            raise CommandError('No users to log in with, run generate_data first.')
+
+        if options['base_url'] and options['baseline']:
+            raise CommandError('--baseline patches this process, it cannot be combined with --base-url.')
+        if options['base_url']:
+            transport = HttpTransport(options['base_url'], options['timeout'])
+        else:
+            transport = InProcessTransport()
+        recorder = Recorder()
+
+        def login(rnd):
+            username, email = rnd.choice(users)
+            invalid = rnd.random() < options['invalid_ratio']
+            recorder.timed('invalid' if invalid else 'login', lambda: transport.request('POST', '/get-token/', None, {
+                'username': rnd.choice((username, email)),
+                'password': options['password'] + ('-wrong' if invalid else ''),
+            }))
+
+        with baseline_login() if options['baseline'] else nullcontext():
+            elapsed = run_concurrently(login, options['concurrency'], requests=options['requests'], seed=options['seed'])
+
+        output = options['output'] or default_report_path('bench_login')
+        config = {key: options[key] for key in (
+            'requests', 'concurrency', 'users', 'invalid_ratio', 'base_url', 'baseline', 'seed')}
+        report = write_report(output, 'bench_login', config, recorder.summary(elapsed),
+                              elapsed_seconds=round(elapsed, 3))
+
+        for name, result in {**report['endpoints'], 'total': report['total']}.items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<8} {result['requests']:>6} req {result['throughput_rps']:>8} req/s "
+                f"p50 {latency.get('p50')} p95 {latency.get('p95')} p99 {latency.get('p99')} ms "
+                f"status codes {result['status_codes']}")
+        self.stdout.write(self.style.SUCCESS(f'Report written to {output}'))
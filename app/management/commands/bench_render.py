@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from app.models import User
+from app.services.benchmark import default_report_path, latency_summary, write_report
+from app.services.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+
+RENDERERS = {
+    'drf_json': JSONRenderer,
+    'orjson': ORJSONRenderer,
+    'msgpack': MessagePackRenderer,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Render typical payloads (a slot list page and a booking list page, fetched from this database) '
+        'with DRF\'s JSONRenderer, the orjson renderer and the MessagePack renderer, and report render '
+        'latency and payload size as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--output', help='Report path (default bench_render-<timestamp>.bench.json).')
+
+    def handle(self, *args, **options):
+        user = User.objects.annotate(bookings=Count('user_booking')).order_by('-bookings').first()
+        if user is None or not user.bookings:
+            raise CommandError('No bookings to render, run generate_data first.')
+
+        client = APIClient()
+        client.force_authenticate(user)
+        payloads = {
+            'slot_list': client.get('/api/parkslots/', {'page_size': options['page_size']}).data,
+            'booking_list': client.get('/api/bookings/', {'page_size': options['page_size']}).data,
+        }
+
+        renderers = {name: renderer() for name, renderer in RENDERERS.items()
+                     if renderer is not MessagePackRenderer or msgpack is not None}
+        results = {}
+        for payload_name, data in payloads.items():
+            for name, renderer in renderers.items():
+                body = renderer.render(data)
+                timings = []
+                for _ in range(options['iterations']):
+                    started = time.perf_counter()
+                    renderer.render(data)
+                    timings.append(time.perf_counter() - started)
+                results[f'{payload_name}/{name}'] = {'bytes': len(body), 'latency_ms': latency_summary(timings)}
+
+        output = options['output'] or default_report_path('bench_render')
+        config = {'page_size': options['page_size'], 'iterations': options['iterations']}
+        write_report(output, 'bench_render', config, {'payloads': results})
+
+        for name, result in results.items():
+            baseline = results[name.split('/')[0] + '/drf_json']['latency_ms']['p50']
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<24} {result['bytes']:>7} bytes p50 {latency['p50']:>8} ms p99 {latency['p99']:>8} ms "
+                f"{baseline / latency['p50']:>6.1f}x")
+        self.stdout.write(self.style.SUCCESS(f'Report written to {output}'))
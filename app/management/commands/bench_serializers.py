@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+
+from app.models import ParkSlot
+from app.serializers import ParkSlotSerializer, slot_list_data, slot_list_fields, slot_list_values
+from app.services.benchmark import default_report_path, latency_summary, write_report
+
+MAP_PIN_FIELDS = 'id,coordinates,price,type,status'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the slot listing serialization paths at several page sizes: ParkSlotSerializer over model '
+        'instances, the values() fast path, and the fast path with map pin ?fields=. Times query plus '
+        'serialization of one page and reports per-page latency and rows per second as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='50,500', help='Comma separated page sizes (default 50,500).')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', help='Report path (default bench_serializers-<timestamp>.bench.json).')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['rows'].split(',')]
+        if ParkSlot.objects.count() < max(sizes):
+            raise CommandError(f'Needs at least {max(sizes)} park slots, run generate_data first.')
+
+        request = APIRequestFactory().get('/api/parkslots/')
+        queryset = ParkSlot.objects.order_by('-created_at')
+        all_fields, pin_fields = slot_list_fields(None), slot_list_fields(MAP_PIN_FIELDS)
+        paths = {
+            'serializer': lambda rows: ParkSlotSerializer(
+                list(queryset[:rows]), many=True, context={'request': request}).data,
+            'values': lambda rows: slot_list_data(
+                list(slot_list_values(queryset, all_fields)[:rows]), all_fields, request),
+            'values_map_pins': lambda rows: slot_list_data(
+                list(slot_list_values(queryset, pin_fields)[:rows]), pin_fields, request),
+        }
+
+        results = {}
+        for rows in sizes:
+            for name, serialize in paths.items():
+                serialize(rows)  # warm up
+                timings = []
+                for _ in range(options['iterations']):
+                    started = time.perf_counter()
+                    serialize(rows)
+                    timings.append(time.perf_counter() - started)
+                latency = latency_summary(timings)
+                results[f'{name}@{rows}'] = {
+                    'rows': rows,
+                    'latency_ms': latency,
+                    'rows_per_second': round(rows / (latency['p50'] / 1000)),
+                }
+
+        output = options['output'] or default_report_path('bench_serializers')
+        config = {'rows': sizes, 'iterations': options['iterations'], 'map_pin_fields': MAP_PIN_FIELDS}
+        write_report(output, 'bench_serializers', config, {'paths': results})
+
+        for name, result in results.items():
+            latency = result['latency_ms']
+            baseline = results[f"serializer@{result['rows']}"]['latency_ms']['p50']
+            self.stdout.write(
+                f"{name:<22} p50 {latency['p50']:>9} ms p95 {latency['p95']:>9} ms "
+                f"{result['rows_per_second']:>9} rows/s {baseline / latency['p50']:>6.1f}x")
+        self.stdout.write(self.style.SUCCESS(f'Report written to {output}'))
@@ -0,0 +1,154 @@
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app.models import Booking, ParkSlot, Rating, User
+from app.services.benchmark import (
+    HttpTransport, InProcessTransport, Recorder, default_report_path, run_concurrently, write_report)
+from app.services.fake_gateway import FakeKhaltiGateway
+
+DEFAULT_MIX = 'list=35,retrieve=25,bookings=20,book=10,rate=10'
+
+
+def parse_mix(value):
+    try:
+        mix = {name: float(weight) for name, weight in (part.split('=') for part in value.split(','))}
+    except ValueError:
+        raise CommandError(f'Invalid --mix "{value}", expected name=weight,...')
+    unknown = set(mix) - set(Scenario.operations)
+    if unknown:
+        raise CommandError(f'Unknown operations in --mix: {", ".join(sorted(unknown))}')
+    return mix
+
+
+class Scenario:
+    """
+    A realistic mix of user calls against the data already in the database.
+    """
+    operations = ['list', 'retrieve', 'bookings', 'book', 'rate']
+
+    def __init__(self, transport, recorder, mix, users):
+        self.transport = transport
+        self.recorder = recorder
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.now = timezone.now()
+
+        self.slot_ids = list(ParkSlot.objects.values_list('id', flat=True))
+        customers = User.objects.filter(role_type='user', is_active=True).order_by('?')[:users]
+        self.tokens = [str(RefreshToken.for_user(user).access_token) for user in customers]
+        if not self.slot_ids or not self.tokens:
+            raise CommandError('No park slots or users to benchmark against, run generate_data first.')
+
+        # finished paid bookings whose user has not rated the slot yet
+        self.lock = threading.Lock()
+        unrated = Booking.objects.filter(
+            ~Exists(Rating.objects.filter(slot_id=OuterRef('slot_id'), user_id=OuterRef('user_id'))),
+            booked=True, end_time__lte=self.now)
+        self.rateable = deque(unrated.select_related('user').order_by('?')[:users * 20])
+
+    def __call__(self, rnd):
+        name = rnd.choices(self.names, self.weights)[0]
+        self.recorder.timed(name, lambda: getattr(self, name)(rnd))
+
+    def list(self, rnd):
+        # first few pages, staying within what exists so the mix measures listings and not 404s
+        pages = len(self.slot_ids) // 50
+        params = {'page': rnd.randint(1, max(1, min(5, pages)))}
+        if rnd.random() < 0.5:
+            params = {'type': 'Car', 'page': rnd.randint(1, max(1, min(5, pages // 3)))}
+        return self.transport.request('GET', '/api/parkslots/', rnd.choice(self.tokens), params)
+
+    def retrieve(self, rnd):
+        return self.transport.request('GET', f'/api/parkslots/{rnd.choice(self.slot_ids)}/', rnd.choice(self.tokens))
+
+    def bookings(self, rnd):
+        return self.transport.request('GET', '/api/bookings/', rnd.choice(self.tokens))
+
+    def book(self, rnd):
+        start_time = (self.now + timedelta(days=rnd.randint(30, 365))).replace(
+            hour=rnd.randint(0, 20), minute=0, second=0, microsecond=0)
+        end_time = start_time + timedelta(hours=rnd.randint(1, 3))
+        return self.transport.request('POST', '/api/book/', rnd.choice(self.tokens), {
+            'park_slot_id': rnd.choice(self.slot_ids),
+            'start_time': start_time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'end_time': end_time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+
+    def rate(self, rnd):
+        with self.lock:
+            booking = self.rateable.popleft() if self.rateable else None
+        if booking is None:
+            # nothing left to rate, measure the rejection path instead
+            return self.transport.request(
+                'POST', '/api/rate/', rnd.choice(self.tokens), {'booking_id': 0, 'rating': 5})
+        token = str(RefreshToken.for_user(booking.user).access_token)
+        return self.transport.request(
+            'POST', '/api/rate/', token, {'booking_id': booking.id, 'rating': rnd.randint(1, 5)})
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a mix of list/retrieve/bookings/book/rate calls and report throughput and p50/p95/p99 latency '
+        'per endpoint as JSON. Writes bookings and ratings, so run it against a generate_data database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--duration', type=float, help='Run for this many seconds instead of --requests.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Operation weights (default {DEFAULT_MIX}).')
+        parser.add_argument('--users', type=int, default=200, help='How many users the requests are spread over.')
+        parser.add_argument('--base-url', help='Benchmark a running server instead of this process. '
+                                               'Start it with KHALTI_BASE_URL pointing at fake_gateway.')
+        parser.add_argument('--timeout', type=float, default=30, help='Per request timeout with --base-url.')
+        parser.add_argument('--gateway-latency-ms', type=float, default=50,
+                            help='Latency of the in-process fake payment gateway.')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='Report path (default benchmark-<timestamp>.bench.json).')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        requests_count = None if options['duration'] else options['requests']
+        recorder = Recorder()
+
+        if options['base_url']:
+            transport = HttpTransport(options['base_url'], options['timeout'])
+            elapsed = self.run(Scenario(transport, recorder, mix, options['users']), requests_count, options)
+        else:
+            gateway = FakeKhaltiGateway(latency=options['gateway_latency_ms'] / 1000, seed=options['seed'])
+            with gateway, override_settings(KHALTI_BASE_URL=gateway.base_url):
+                elapsed = self.run(Scenario(InProcessTransport(), recorder, mix, options['users']),
+                                   requests_count, options)
+
+        output = options['output'] or default_report_path('benchmark')
+        config = {key: options[key] for key in (
+            'requests', 'duration', 'concurrency', 'users', 'base_url', 'gateway_latency_ms', 'seed')}
+        config['mix'] = mix
+        dataset = {
+            'users': User.objects.count(),
+            'slots': ParkSlot.objects.count(),
+            'bookings': Booking.objects.count(),
+            'ratings': Rating.objects.count(),
+        }
+        report = write_report(output, 'benchmark', config, recorder.summary(elapsed),
+                              dataset=dataset, elapsed_seconds=round(elapsed, 3))
+
+        for name, result in {**report['endpoints'], 'total': report['total']}.items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<10} {result['requests']:>7} req {result['throughput_rps']:>9} req/s "
+                f"p50 {latency.get('p50')} p95 {latency.get('p95')} p99 {latency.get('p99')} ms "
+                f"errors {result['errors']}")
+        self.stdout.write(self.style.SUCCESS(f'Report written to {output}'))
+
+    def run(self, scenario, requests_count, options):
+        return run_concurrently(
+            scenario, options['concurrency'], requests=requests_count, duration=options['duration'],
+            seed=options['seed'])
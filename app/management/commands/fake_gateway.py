@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app.services.fake_gateway import FakeKhaltiGateway
+
+
+class Command(BaseCommand):
+    help = 'Serve a local fake Khalti gateway; run the app with KHALTI_BASE_URL pointing at it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every gateway call.')
+        parser.add_argument('--success-ratio', type=float, default=1.0,
+                            help='Share of payment lookups that report Completed.')
+
+    def handle(self, *args, **options):
+        gateway = FakeKhaltiGateway(
+            options['host'], options['port'], options['latency_ms'] / 1000, options['success_ratio'])
+        self.stdout.write(self.style.SUCCESS(f'Fake Khalti gateway at {gateway.base_url}'))
+        try:
+            gateway.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            gateway.server_close()
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.synthetic_data import PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate synthetic users, park slots, bookings, payments and ratings for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--slots', type=int, default=1000)
+        parser.add_argument('--bookings-per-slot', type=int, default=50)
+        parser.add_argument('--rating-ratio', type=float, default=0.3,
+                            help='Share of finished paid bookings whose user rates the slot.')
+        parser.add_argument('--days-back', type=int, default=90, help='How far in the past bookings start.')
+        parser.add_argument('--seed', type=int, help='Seed for a reproducible data set.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['slots'] < 0 or options['bookings_per_slot'] < 0:
+            raise CommandError('--users must be positive, --slots and --bookings-per-slot not negative.')
+
+        def progress(created):
+            self.stdout.write(f"{created['slots']}/{options['slots']} slots, {created['bookings']} bookings")
+
+        created = generate(
+            users=options['users'],
+            slots=options['slots'],
+            bookings_per_slot=options['bookings_per_slot'],
+            rating_ratio=options['rating_ratio'],
+            days_back=options['days_back'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+
+        summary = ', '.join(f'{count} {name}' for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}. Every user logs in with "{PASSWORD}".'))
@@ -0,0 +1,51 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from app.models import ParkSlot, User
+from app.services.images import render_variants, variant_names
+
+PICTURES = [
+    (ParkSlot, 'picture', 'picture_variants'),
+    (User, 'profilePic', 'profile_pic_variants'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the resized variants of slot and profile pictures uploaded before variants existed, '
+        'or of every picture with --all (e.g. after changing IMAGE_VARIANTS).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render pictures that already have variants.')
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_PROCESSING_WORKERS)
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=get_context('spawn')) as pool:
+            for model, field, variants_field in PICTURES:
+                pictures = model.objects.exclude(Q(**{field: ''}) | Q(**{f'{field}__isnull': True}))
+                if not options['all']:
+                    pictures = pictures.filter(**{variants_field: {}})
+
+                futures = {
+                    pool.submit(render_variants, getattr(instance, field).path, settings.IMAGE_VARIANTS,
+                                settings.IMAGE_VARIANT_QUALITY): instance
+                    for instance in pictures.only('pk', field)
+                }
+                done = failed = 0
+                for future in as_completed(futures):
+                    instance = futures[future]
+                    try:
+                        setattr(instance, variants_field, variant_names(getattr(instance, field), future.result()))
+                    except Exception as e:
+                        self.stderr.write(f'{model.__name__} {instance.pk}: {e}')
+                        failed += 1
+                        continue
+                    instance.save(update_fields=[variants_field, 'updated_at'])
+                    done += 1
+
+                self.stdout.write(f'{model.__name__}: {done} pictures processed, {failed} failed')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.services.analytics import rebuild_slot_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SlotDailyStats rollups from paid bookings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slot', type=int, action='append', dest='slots', help='Only rebuild these slot ids.')
+
+    def handle(self, *args, **options):
+        written = rebuild_slot_stats(options['slots'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily stats rows.'))
@@ -0,0 +1,73 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.schedular import expire_checkouts, update_payment_status
+from app.services import response_cache
+from app.services.lease import Lease
+
+LEASE_NAME = 'payment-reconciler'
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconcile pending payments with Khalti and expire abandoned checkouts in a loop. '
+        'Run as many instances as you like: they elect one leader through a database lease '
+        'and the others stand by to take over.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.PAYMENT_RECONCILE_INTERVAL_SECONDS,
+                            help='Seconds between reconciliation passes.')
+        parser.add_argument('--lease', type=float, default=settings.PAYMENT_WORKER_LEASE_SECONDS,
+                            help='Lease length in seconds; failover happens within this time.')
+        parser.add_argument('--once', action='store_true', help='Run a single pass if the lease is free, then exit.')
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        handlers = {signum: signal.signal(signum, lambda *_: stopping.set())
+                    for signum in (signal.SIGINT, signal.SIGTERM)}
+
+        if not response_cache.is_shared():
+            self.stdout.write(self.style.WARNING(
+                'The cache is per process (locmem): web workers will not see payments settled here until their '
+                'cached slot responses expire. Set CACHE_DIR for a shared cache.'))
+
+        lease = Lease(LEASE_NAME, options['lease'])
+        retry = options['lease'] / 3
+        standby = False
+        try:
+            while not stopping.is_set():
+                if not lease.acquire():
+                    if options['once']:
+                        self.stdout.write('Another worker holds the lease.')
+                        return
+                    if not standby:
+                        self.stdout.write(f'{lease.holder} standing by.')
+                        standby = True
+                    stopping.wait(retry)
+                    continue
+
+                standby = False
+                self.stdout.write(self.style.SUCCESS(f'{lease.holder} is the payment worker.'))
+                with lease.keep_alive() as lost:
+                    def active():
+                        return not (stopping.is_set() or lost.is_set())
+
+                    while active():
+                        update_payment_status(should_continue=active)
+                        expired, released = expire_checkouts(should_continue=active)
+                        if expired or released:
+                            self.stdout.write(f'Expired {expired} checkouts, released {released} bookings.')
+                        if options['once']:
+                            return
+                        stopping.wait(options['interval'])
+
+                if lost.is_set():
+                    self.stdout.write(self.style.WARNING(f'{lease.holder} lost the lease.'))
+        finally:
+            lease.release()
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:47
+
+from django.db import migrations, models
+
+from app.services.geo import encode_geohash, parse_coordinates
+
+
+def backfill_geo(apps, schema_editor):
+    ParkSlot = apps.get_model('app', 'ParkSlot')
+    slots = []
+    for slot in ParkSlot.objects.exclude(coordinates__isnull=True).only('id', 'coordinates').iterator():
+        slot.latitude, slot.longitude = parse_coordinates(slot.coordinates)
+        if slot.latitude is None:
+            continue
+        slot.geohash = encode_geohash(slot.latitude, slot.longitude)
+        slots.append(slot)
+    ParkSlot.objects.bulk_update(slots, ['latitude', 'longitude', 'geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parkslot',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='parkslot',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='parkslot',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_geo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    ParkSlot = apps.get_model('app', 'ParkSlot')
+    Rating = apps.get_model('app', 'Rating')
+    for row in Rating.objects.values('slot').annotate(count=Count('id'), total=Sum('rating')).order_by():
+        ParkSlot.objects.filter(pk=row['slot']).update(
+            rating_count=row['count'], rating_total=row['total'], rating_avg=row['total'] / row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_parkslot_geo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parkslot',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='parkslot',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='parkslot',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='slot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_rating', to='app.parkslot'),
+        ),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('slot', 'user'), name='unique_slot_user_rating'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('booked', True)), fields=['slot', 'end_time', 'start_time'], name='booking_slot_window_idx'),
+        ),
+    ]
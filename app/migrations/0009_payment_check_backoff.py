@@ -0,0 +1,28 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_booking_window_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='check_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='next_check_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'next_check_at'], name='payment_status_next_check_idx'),
+        ),
+    ]
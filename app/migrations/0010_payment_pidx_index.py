@@ -0,0 +1,18 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_payment_check_backoff'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='pidx',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
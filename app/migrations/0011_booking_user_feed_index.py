@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_payment_pidx_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('booked', True)), fields=['user', '-start_time', '-id'], name='booking_user_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_booking_user_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('booked', True)), fields=['slot', '-start_time', '-id'], name='booking_slot_ledger_idx'),
+        ),
+    ]
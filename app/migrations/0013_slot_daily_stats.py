@@ -0,0 +1,30 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_booking_slot_ledger_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('booked_duration', models.FloatField(default=0)),
+                ('booked_minutes', models.FloatField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_daily_stats', to='app.parkslot')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='slotdailystats',
+            constraint=models.UniqueConstraint(fields=('slot', 'date'), name='unique_slot_daily_stats'),
+        ),
+    ]
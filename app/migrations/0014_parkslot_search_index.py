@@ -0,0 +1,89 @@
+from django.db import OperationalError, migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE app_parkslot_fts USING fts5(
+        address, description, content='app_parkslot', content_rowid='id',
+        prefix='2 3', tokenize='unicode61 remove_diacritics 2')
+    """,
+    """
+    CREATE TRIGGER app_parkslot_fts_insert AFTER INSERT ON app_parkslot BEGIN
+        INSERT INTO app_parkslot_fts(rowid, address, description) VALUES (new.id, new.address, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER app_parkslot_fts_delete AFTER DELETE ON app_parkslot BEGIN
+        INSERT INTO app_parkslot_fts(app_parkslot_fts, rowid, address, description)
+        VALUES ('delete', old.id, old.address, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER app_parkslot_fts_update AFTER UPDATE OF address, description ON app_parkslot BEGIN
+        INSERT INTO app_parkslot_fts(app_parkslot_fts, rowid, address, description)
+        VALUES ('delete', old.id, old.address, old.description);
+        INSERT INTO app_parkslot_fts(rowid, address, description) VALUES (new.id, new.address, new.description);
+    END
+    """,
+    "INSERT INTO app_parkslot_fts(app_parkslot_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS app_parkslot_fts_update",
+    "DROP TRIGGER IF EXISTS app_parkslot_fts_delete",
+    "DROP TRIGGER IF EXISTS app_parkslot_fts_insert",
+    "DROP TABLE IF EXISTS app_parkslot_fts",
+]
+
+# the expression must match app.services.search.POSTGRES_DOCUMENT for the index to be used
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS app_parkslot_search_idx ON app_parkslot USING GIN (
+        to_tsvector('simple', coalesce(address, '') || ' ' || coalesce(description, '')))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS app_parkslot_search_idx",
+]
+
+
+def sqlite_has_fts5(cursor):
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(probe)")
+    except OperationalError:
+        return False
+    cursor.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite' and sqlite_has_fts5(cursor):
+            statements = SQLITE_FORWARD
+        elif connection.vendor == 'postgresql':
+            statements = POSTGRES_FORWARD
+        else:
+            # no search index; ParkSlotSearchFilter falls back to icontains
+            return
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    statements = {'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_slot_daily_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.2 on 2026-10-18 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_parkslot_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parkslot',
+            index=models.Index(fields=['-created_at'], name='parkslot_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkslot',
+            index=models.Index(fields=['owner', '-created_at'], name='parkslot_owner_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.2 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_parkslot_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('holder', models.CharField(blank=True, default='', max_length=255)),
+                ('acquired_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
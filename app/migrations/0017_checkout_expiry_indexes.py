@@ -0,0 +1,29 @@
+# Generated by Django 4.1.2 on 2026-10-18 06:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_worker_lease'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_status_next_check_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('booked', False), ('is_active', True)), fields=['created_at'], name='booking_open_checkout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'Pending')), fields=['next_check_at'], name='payment_pending_check_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'Pending')), fields=['created_at'], name='payment_pending_created_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.2 on 2026-10-18 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_checkout_expiry_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_slot_window_idx',
+        ),
+        migrations.AddField(
+            model_name='parkslot',
+            name='reservation_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['slot', 'end_time', 'start_time'], name='booking_slot_window_idx'),
+        ),
+    ]
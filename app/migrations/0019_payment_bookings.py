@@ -0,0 +1,18 @@
+# Generated by Django 4.1.2 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_booking_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='bookings',
+            field=models.ManyToManyField(blank=True, related_name='bulk_payment', to='app.booking'),
+        ),
+    ]
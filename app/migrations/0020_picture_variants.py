@@ -0,0 +1,23 @@
+# Generated by Django 4.1.2 on 2026-10-18 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_payment_bookings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parkslot',
+            name='picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_pic_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.2 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parkslot',
+            name='rate_table',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,9 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import FileExtensionValidator
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from app.services.geo import encode_geohash, parse_coordinates
+
 
 class User(AbstractUser):
     role_choices = (
@@ -15,6 +18,8 @@ class User(AbstractUser):
     profilePic = models.ImageField(
         upload_to='mediafiles/profilePics/',
         validators=[FileExtensionValidator(allowed_extensions=['jpeg', 'jpg', 'png'])])
+    # resized copies of profilePic, see app.services.images
+    profile_pic_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True, editable=False)
@@ -52,18 +57,53 @@ class ParkSlot(BaseModel):
 
     status = models.CharField(max_length=32, choices=slot_choices, default='Available')
     price = models.FloatField()  # price per hour
+    # hourly tiers, time-of-day bands and a daily maximum on top of price, see app.services.pricing
+    rate_table = models.JSONField(default=dict, blank=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='slot_owner')
     address = models.CharField(max_length=255)
     coordinates = models.CharField(max_length=64, blank=True, null=True)
+    latitude = models.FloatField(blank=True, null=True, editable=False)
+    longitude = models.FloatField(blank=True, null=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, null=True, db_index=True, editable=False)
     description = models.TextField()
     type = models.CharField(max_length=255, choices=type_choices)
     picture = models.ImageField(
         upload_to='mediafiles/parkPic/',
         validators=[FileExtensionValidator(allowed_extensions=['jpeg', 'jpg', 'png'])], blank=True, null=True)
+    # resized copies of picture, see app.services.images
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    # denormalized from Rating, maintained by app.services.ratings
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_total = models.PositiveIntegerField(default=0, editable=False)
+
+    # bumped by every reservation, see app.services.availability.reserve
+    reservation_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # slot listings, newest first
+            models.Index(fields=['-created_at'], name='parkslot_created_idx'),
+            models.Index(fields=['owner', '-created_at'], name='parkslot_owner_created_idx'),
+        ]
 
     def __str__(self):
         return "{}".format(self.id)
 
+    def save(self, *args, **kwargs):
+        '''keep parsed lat/lng and geohash in sync with coordinates'''
+        self.latitude, self.longitude = parse_coordinates(self.coordinates)
+        self.geohash = None
+        if self.latitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'coordinates' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'latitude', 'longitude', 'geohash'}
+
+        super().save(*args, **kwargs)
+
 
 class Booking(BaseModel):
     slot = models.ForeignKey(ParkSlot, on_delete=models.CASCADE, related_name='slot_booking')
@@ -75,6 +115,26 @@ class Booking(BaseModel):
     booked = models.BooleanField(default=False)
     is_paid = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # availability lookups, see app.services.availability
+            models.Index(
+                fields=['slot', 'end_time', 'start_time'], condition=models.Q(is_active=True),
+                name='booking_slot_window_idx'),
+            # owner booking ledger, see app.services.bookings.ledger_page
+            models.Index(
+                fields=['slot', '-start_time', '-id'], condition=models.Q(booked=True),
+                name='booking_slot_ledger_idx'),
+            # user bookings feed, see app.views.get_bookings_of_user
+            models.Index(
+                fields=['user', '-start_time', '-id'], condition=models.Q(booked=True),
+                name='booking_user_feed_idx'),
+            # open checkouts, see app.schedular.expire_checkouts
+            models.Index(
+                fields=['created_at'], condition=models.Q(booked=False, is_active=True),
+                name='booking_open_checkout_idx'),
+        ]
+
     def __str__(self):
         return "{}".format(self.id)
 
@@ -87,13 +147,29 @@ class Payment(BaseModel):
     )
 
     amount = models.FloatField()
-    pidx = models.CharField(max_length=255)
+    pidx = models.CharField(max_length=255, db_index=True)
     payment_url = models.URLField()
     transaction_id = models.CharField(max_length=255, blank=True, null=True)
     status = models.CharField(max_length=32, choices=status_choices, default='Pending')
     gateway_status = models.CharField(max_length=60, default='Pending')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_payment')
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='booking_payment')
+    # every booking a bulk or recurring checkout pays for, booking being the first; empty for single bookings
+    bookings = models.ManyToManyField(Booking, blank=True, related_name='bulk_payment')
+
+    # reconciliation backoff, see app.schedular
+    check_count = models.PositiveIntegerField(default=0, editable=False)
+    next_check_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # only pending payments are indexed, so the reconcile and expiry scans (app.schedular)
+            # stay as small as the open checkouts however much history builds up
+            models.Index(
+                fields=['next_check_at'], condition=models.Q(status='Pending'), name='payment_pending_check_idx'),
+            models.Index(
+                fields=['created_at'], condition=models.Q(status='Pending'), name='payment_pending_created_idx'),
+        ]
 
     def __str__(self):
         return "{}".format(self.id)
@@ -101,8 +177,46 @@ class Payment(BaseModel):
 
 class Rating(BaseModel):
     rating = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
-    slot = models.OneToOneField(ParkSlot, on_delete=models.CASCADE, related_name='slot_rating')
+    slot = models.ForeignKey(ParkSlot, on_delete=models.CASCADE, related_name='slot_rating')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_rating')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['slot', 'user'], name='unique_slot_user_rating'),
+        ]
+
     def __str__(self):
         return "{}".format(self.id)
+
+
+class SlotDailyStats(models.Model):
+    """
+    Per slot, per day rollup of paid bookings, maintained by app.services.analytics.
+    """
+    slot = models.ForeignKey(ParkSlot, on_delete=models.CASCADE, related_name='slot_daily_stats')
+    date = models.DateField()
+    bookings = models.PositiveIntegerField(default=0)  # paid bookings starting this day
+    booked_duration = models.FloatField(default=0)  # total minutes of those bookings
+    booked_minutes = models.FloatField(default=0)  # minutes of this day the slot was occupied
+    revenue = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['slot', 'date'], name='unique_slot_daily_stats'),
+        ]
+
+    def __str__(self):
+        return "{} {}".format(self.slot_id, self.date)
+
+
+class WorkerLease(models.Model):
+    """
+    Time-limited lock that lets exactly one background worker instance run a job, see app.services.lease.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    holder = models.CharField(max_length=255, blank=True, default='')
+    acquired_at = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return "{} {}".format(self.name, self.holder)
@@ -1,25 +1,103 @@
+import asyncio
+import weakref
+
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from app.models import Booking, Payment
+from app.services import response_cache
+from app.services.analytics import record_paid_bookings
+
+
+def _gateway_session():
+    '''
+    Shared session so gateway calls reuse pooled keep-alive connections.
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.PAYMENT_RECONCILE_WORKERS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+session = _gateway_session()
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_gateway_client():
+    '''
+    Shared httpx client of the running event loop, so async gateway calls reuse pooled connections.
+    A client cannot be used outside the loop it was created in, hence one per loop.
+    '''
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        connect, read = settings.PAYMENT_GATEWAY_TIMEOUT
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=settings.PAYMENT_GATEWAY_MAX_CONNECTIONS))
+        _async_clients[loop] = client
+    return client
+
+
+def _headers():
+    return {
+        'Authorization': f'key {settings.KHALTI_SECRET_KEY}',
+        'Content-Type': 'application/json',
+    }
+
+
+# Map status to category
+STATUS_MAPPING = {
+    "Pending": "Pending",
+    "Initiated": "Pending",
+    "Completed": "Success",
+    "Expired": "Failed",
+    "User canceled": "Failed",
+    "Not found.": "Failed",
+    "Refunded": "Failed",
+    "Partially Refunded": "Failed",
+}
 
 
-def create_payment_link(amount, booking_id, order_id):
+def _initiate_request(amount, booking_id, order_id, return_url):
     url = f"{settings.KHALTI_BASE_URL}/api/v2/epayment/initiate/"
 
     payload = {
-        "return_url": "https://localhost:3000",
-        "website_url": "https://localhost:3000",
+        "return_url": return_url,
+        "website_url": settings.KHALTI_WEBSITE_URL,
         "amount": amount * 100,  # in paisa
         "purchase_order_id": order_id,
         "purchase_order_name": f"booking-{booking_id}",
         "remarks": booking_id,
     }
-    headers = {
-        'Authorization': f'key {settings.KHALTI_SECRET_KEY}',
-        'Content-Type': 'application/json',
+    return url, payload
+
+
+def _lookup_request(pidx):
+    url = f"{settings.KHALTI_BASE_URL}/api/v2/epayment/lookup/"
+
+    payload = {
+        "pidx": pidx,
     }
+    return url, payload
+
+
+def _lookup_result(data):
+    status = data.get('status') or data.get('detail')
+    transaction_id = data.get('transaction_id', None)
+    return STATUS_MAPPING.get(status, "Failed"), status, transaction_id
+
+
+def create_payment_link(amount, booking_id, order_id, return_url):
+    url, payload = _initiate_request(amount, booking_id, order_id, return_url)
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        print(response.text)
+        response = session.post(url, headers=_headers(), json=payload, timeout=settings.PAYMENT_GATEWAY_TIMEOUT)
 
         if response.status_code == 200:
             return response.json()
@@ -30,36 +108,99 @@ def create_payment_link(amount, booking_id, order_id):
 
 
 def check_payment_status(pidx):
-    url = f"{settings.KHALTI_BASE_URL}/api/v2/epayment/lookup/"
+    url, payload = _lookup_request(pidx)
+    try:
+        response = session.post(url, headers=_headers(), json=payload, timeout=settings.PAYMENT_GATEWAY_TIMEOUT)
+        return _lookup_result(response.json())
+    except Exception as e:
+        print(e)
+        return None, None, None
 
-    payload = {
-        "pidx": pidx,
-    }
-    headers = {
-        'Authorization': f'key {settings.KHALTI_SECRET_KEY}',
-        'Content-Type': 'application/json',
-    }
+
+async def acreate_payment_link(amount, booking_id, order_id, return_url):
+    """
+    Async create_payment_link for async views; waiting on Khalti holds no thread.
+    """
+    url, payload = _initiate_request(amount, booking_id, order_id, return_url)
+    try:
+        response = await _async_gateway_client().post(url, headers=_headers(), json=payload)
+
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except Exception as e:
+        print(e)
+        return None
+
+
+async def acheck_payment_status(pidx):
+    """
+    Async check_payment_status for async views.
+    """
+    url, payload = _lookup_request(pidx)
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        print(response.text)
-        data = response.json()
-
-        status = data.get('status') or data.get('detail')
-        transaction_id = data.get('transaction_id', None)
-
-        # Map status to category
-        status_mapping = {
-            "Pending": "Pending",
-            "Initiated": "Pending",
-            "Completed": "Success",
-            "Expired": "Failed",
-            "User canceled": "Failed",
-            "Not found.": "Failed",
-            "Refunded": "Failed",
-            "Partially Refunded": "Failed",
-        }
-
-        return status_mapping.get(status, "Failed"), status, transaction_id
+        response = await _async_gateway_client().post(url, headers=_headers(), json=payload)
+        return _lookup_result(response.json())
     except Exception as e:
         print(e)
         return None, None, None
+
+
+def apply_payment_status(payment, status, gateway_status, txn_id):
+    """
+    Copy a gateway result onto the payment.
+    Returns True when anything changed. Nothing is saved here, see save_payment_status.
+    """
+    if not status or gateway_status == payment.gateway_status:
+        return False
+
+    payment.status = status
+    payment.gateway_status = gateway_status
+    payment.transaction_id = txn_id
+    return True
+
+
+def covered_bookings(payments):
+    """
+    {payment id: ids of the bookings it pays for}, for single and bulk payments alike.
+    """
+    covered = {payment.pk: {payment.booking_id} for payment in payments}
+    bulk = Payment.bookings.through.objects.filter(payment_id__in=covered).values_list('payment_id', 'booking_id')
+    for payment_id, booking_id in bulk:
+        covered[payment_id].add(booking_id)
+    return covered
+
+
+def save_payment_status(payments):
+    """
+    Persist statuses set by apply_payment_status, mark the bookings of successful payments paid
+    and add them to the daily rollups, and release the bookings of failed ones.
+    Only payments that are still Pending are written, so a stale poll result can never
+    overwrite a payment the callback (or another poller) has already settled.
+    Returns the ids of the payments that were written.
+    """
+    if not payments:
+        return []
+
+    now = timezone.now()
+    with transaction.atomic():
+        pending = set(Payment.objects.select_for_update().filter(
+            pk__in=[payment.pk for payment in payments], status='Pending').values_list('pk', flat=True))
+        saved = [payment for payment in payments if payment.pk in pending]
+        for payment in saved:
+            payment.updated_at = now
+        Payment.objects.bulk_update(saved, ['status', 'gateway_status', 'transaction_id', 'updated_at'])
+
+        covered = covered_bookings(saved)
+        paid = [booking_id for payment in saved if payment.status == 'Success' for booking_id in covered[payment.pk]]
+        if paid:
+            Booking.objects.filter(pk__in=paid).update(is_paid=True, booked=True, updated_at=now)
+            record_paid_bookings(paid)
+            transaction.on_commit(response_cache.invalidate)
+
+        failed = [booking_id for payment in saved if payment.status == 'Failed' for booking_id in covered[payment.pk]]
+        if failed:
+            Booking.objects.filter(pk__in=failed, booked=False).update(is_active=False, updated_at=now)
+            transaction.on_commit(response_cache.invalidate)
+
+    return [payment.id for payment in saved]
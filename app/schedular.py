@@ -1,32 +1,119 @@
-from app.payment import check_payment_status
-from .models import Payment
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
 
+from app.payment import apply_payment_status, check_payment_status, save_payment_status
+from app.services import response_cache
+from .models import Booking, Payment
 
-def run_schedular():
-    schedular = BackgroundScheduler()
-    schedular.add_job(update_payment_status, 'interval', seconds=3)
-    schedular.start()
+
+def next_check_delay(check_count):
+    """
+    Exponential backoff: fresh payments are polled often, old ones rarely.
+    """
+    delay = settings.PAYMENT_CHECK_BACKOFF_SECONDS * 2 ** min(check_count, 16)
+    return timedelta(seconds=min(delay, settings.PAYMENT_CHECK_MAX_BACKOFF_SECONDS))
+
+
+def check_statuses(payments):
+    """
+    Look up a batch of payments at the gateway concurrently.
+    """
+    with ThreadPoolExecutor(max_workers=settings.PAYMENT_RECONCILE_WORKERS) as executor:
+        return list(executor.map(check_payment_status, [payment.pidx for payment in payments]))
+
+
+def reconcile_payments(payments):
+    """
+    Check a batch of pending payments concurrently and write the results back in bulk.
+    """
+    results = check_statuses(payments)
+
+    now = timezone.now()
+    changed = []
+    for payment, (status, gateway_status, txn_id) in zip(payments, results):
+        if apply_payment_status(payment, status, gateway_status, txn_id):
+            changed.append(payment)
+
+        payment.check_count += 1
+        payment.next_check_at = now + next_check_delay(payment.check_count)
+
+    with transaction.atomic():
+        Payment.objects.bulk_update(payments, ['check_count', 'next_check_at'])
+        save_payment_status(changed)
 
 
-def update_payment_status():
+def update_payment_status(should_continue=None):
     """
-    Update payment status. This function will be called by the scheduler.
+    Update payment status. This function is called by the run_payment_worker command.
+    Only payments whose backoff has elapsed are checked, in bounded batches;
+    should_continue is asked before each batch so a worker that lost its lease stops early.
     """
+    now = timezone.now()
+    due = Payment.objects.filter(status='Pending', next_check_at__lte=now).order_by('next_check_at')
 
-    payments = Payment.objects.filter(status='Pending')
-    for payment in payments:
-        status, gateway_status, txn_id = check_payment_status(payment.pidx)
-        if status and gateway_status != payment.gateway_status:
-            payment.status = status
-            payment.gateway_status = gateway_status
-            payment.transaction_id = txn_id
-            payment.save()
+    # checked payments move their next_check_at past now, so each pass picks up the next batch
+    while should_continue is None or should_continue():
+        payments = list(due[:settings.PAYMENT_RECONCILE_BATCH_SIZE])
+        if not payments:
+            break
+        reconcile_payments(payments)
+
+
+def expire_payments(payments):
+    """
+    Final gateway check of payments whose checkout expired: completed ones are still confirmed,
+    everything else is marked Failed. Payments the gateway could not be asked about stay Pending
+    for the next pass, so a payment made just before expiry is never lost to an outage.
+    Returns the ids of the payments that were settled.
+    """
+    settled = []
+    for payment, (status, gateway_status, txn_id) in zip(payments, check_statuses(payments)):
+        if status is None:
+            continue
+
+        apply_payment_status(payment, status, gateway_status, txn_id)
+        if payment.status != 'Success':
+            payment.status = 'Failed'
+        settled.append(payment)
+
+    return save_payment_status(settled)
+
+
+def release_expired_bookings(cutoff):
+    """
+    Deactivate unpaid bookings created before cutoff that have no pending payment left.
+    Returns the number of bookings released.
+    """
+    pending = Payment.objects.filter(Q(booking=OuterRef('pk')) | Q(bookings=OuterRef('pk')), status='Pending')
+    released = Booking.objects.filter(~Exists(pending), booked=False, is_active=True, created_at__lte=cutoff).update(
+        is_active=False, updated_at=timezone.now())
+    if released:
+        transaction.on_commit(response_cache.invalidate)
+    return released
+
+
+def expire_checkouts(should_continue=None):
+    """
+    Close checkouts older than CHECKOUT_TTL_SECONDS: settle their pending payments, then release the bookings.
+    Returns (payments settled, bookings released that had no payment); bookings of payments marked Failed
+    are released by save_payment_status.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHECKOUT_TTL_SECONDS)
+    stale = Payment.objects.filter(status='Pending', created_at__lte=cutoff).order_by('created_at', 'id')
 
-            if status == 'Success':
-                payment.booking.is_paid = True
-                payment.booking.booked = True
-                payment.booking.save()
+    # keyset over the stale set, so payments left Pending by an unreachable gateway are not fetched again
+    settled, batch = 0, stale
+    while should_continue is None or should_continue():
+        payments = list(batch[:settings.PAYMENT_RECONCILE_BATCH_SIZE])
+        if not payments:
+            break
+        settled += len(expire_payments(payments))
+        last = payments[-1]
+        batch = stale.filter(Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.id))
 
-            print(f"Payment {payment.id} updated to {status}")
+    return settled, release_expired_bookings(cutoff)
@@ -1,14 +1,38 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import User, ParkSlot, Rating
-from django.db.models import Avg
+
+from app.services.images import process_picture
+from app.services.pricing import validate_rate_table
+from .models import User, ParkSlot
+
+
+def media_url(name, request=None):
+    """
+    URL of a stored file the way DRF's FileField renders it: absolute when there is a request.
+    """
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+class PictureVariantsField(serializers.ReadOnlyField):
+    """
+    {variant: url} of a picture's resized copies; empty until they have been rendered.
+    """
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        return {name: media_url(path, request) for name, path in variants.items()}
 
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
+    profile_pic_variants = PictureVariantsField()
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'role_type', 'profilePic', 'password']
+        fields = ['id', 'username', 'email', 'role_type', 'profilePic', 'profile_pic_variants', 'password']
 
     def create(self, validated_data):
         password = validated_data.pop('password', None)
@@ -16,18 +40,99 @@ class UserSerializer(serializers.ModelSerializer):
         if password:
             user.set_password(password)
             user.save()
+        process_picture(user, 'profilePic', 'profile_pic_variants')
+        return user
+
+    def update(self, instance, validated_data):
+        if 'profilePic' in validated_data:
+            validated_data['profile_pic_variants'] = {}
+        user = super().update(instance, validated_data)
+        if 'profilePic' in validated_data:
+            process_picture(user, 'profilePic', 'profile_pic_variants')
         return user
 
 
 class ParkSlotSerializer(serializers.ModelSerializer):
-    rating = serializers.SerializerMethodField()
+    rating = serializers.FloatField(source='rating_avg', read_only=True)
+    picture_variants = PictureVariantsField()
 
     class Meta:
         model = ParkSlot
-        fields = ['id', 'status', 'price', 'address', 'coordinates', 'description', 'type', 'picture', 'rating']
+        fields = ['id', 'status', 'price', 'rate_table', 'address', 'coordinates', 'description', 'type',
+                  'picture', 'picture_variants', 'rating', 'rating_count']
+
+    def validate_rate_table(self, value):
+        try:
+            return validate_rate_table(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def create(self, validated_data):
+        slot = super().create(validated_data)
+        process_picture(slot, 'picture', 'picture_variants')
+        return slot
+
+    def update(self, instance, validated_data):
+        if 'picture' in validated_data:
+            validated_data['picture_variants'] = {}
+        slot = super().update(instance, validated_data)
+        if 'picture' in validated_data:
+            process_picture(slot, 'picture', 'picture_variants')
+        return slot
+
+
+# output field -> model column of ParkSlotSerializer, in its field order
+SLOT_LIST_COLUMNS = {
+    'id': 'id',
+    'status': 'status',
+    'price': 'price',
+    'rate_table': 'rate_table',
+    'address': 'address',
+    'coordinates': 'coordinates',
+    'description': 'description',
+    'type': 'type',
+    'picture': 'picture',
+    'picture_variants': 'picture_variants',
+    'rating': 'rating_avg',
+    'rating_count': 'rating_count',
+}
+
+
+def slot_list_fields(param):
+    """
+    ParkSlotSerializer fields selected by a ?fields=id,price,... query param, in serializer order;
+    all of them without one. Raises ValueError on unknown fields.
+    """
+    if not param:
+        return list(SLOT_LIST_COLUMNS)
+    requested = {field.strip() for field in param.split(',') if field.strip()}
+    unknown = requested - set(SLOT_LIST_COLUMNS)
+    if unknown or not requested:
+        raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}. '
+                         f'Choose from {", ".join(SLOT_LIST_COLUMNS)}.')
+    return [field for field in SLOT_LIST_COLUMNS if field in requested]
+
+
+def slot_list_values(queryset, fields):
+    """
+    The queryset narrowed to the columns of fields, as values() rows instead of model instances.
+    """
+    return queryset.values(*(SLOT_LIST_COLUMNS[field] for field in fields))
+
 
-    def get_rating(self, obj):
-        ratings = list(Rating.objects.filter(slot=obj).values_list('rating', flat=True))
-        if ratings:
-            return sum(ratings) / len(ratings)
-        return 0
+def slot_list_data(rows, fields, request=None):
+    """
+    Read-only fast path of ParkSlotSerializer(many=True).data for slot_list_values() rows.
+    The values already have the types DRF would render, so only file fields need converting;
+    the output is the same, without a model instance and a DRF field call per value.
+    """
+    columns = [(field, SLOT_LIST_COLUMNS[field]) for field in fields]
+    data = [{field: row[column] for field, column in columns} for row in rows]
+    if 'picture' in fields:
+        for item in data:
+            item['picture'] = media_url(item['picture'], request)
+    if 'picture_variants' in fields:
+        for item in data:
+            item['picture_variants'] = {
+                name: media_url(path, request) for name, path in item['picture_variants'].items()}
+    return data
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from app.models import Booking, SlotDailyStats
+
+
+def booking_contributions(slot_id, start_time, end_time, duration, total_price):
+    """
+    Split one paid booking into per-day rollup deltas.
+    Counts, duration and revenue go to the start day; occupied minutes go to every day the booking covers.
+    """
+    start_time, end_time = timezone.localtime(start_time), timezone.localtime(end_time)
+    contributions = {
+        (slot_id, start_time.date()): {
+            'bookings': 1, 'booked_duration': duration, 'booked_minutes': 0, 'revenue': total_price}
+    }
+
+    cursor = start_time
+    while cursor < end_time:
+        next_day = timezone.make_aware(datetime.combine(cursor.date() + timedelta(days=1), time.min))
+        minutes = (min(next_day, end_time) - cursor).total_seconds() / 60
+        delta = contributions.setdefault(
+            (slot_id, cursor.date()), {'bookings': 0, 'booked_duration': 0, 'booked_minutes': 0, 'revenue': 0})
+        delta['booked_minutes'] += minutes
+        cursor = next_day
+
+    return contributions
+
+
+def record_paid_bookings(booking_ids):
+    """
+    Add newly paid bookings to the daily rollups with a fixed number of queries.
+    Callers must pass each booking once, when it turns paid (see app.payment.save_payment_status).
+    The rollup rows are locked while they are updated, so concurrent callers never lose counts.
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    bookings = Booking.objects.filter(pk__in=booking_ids).values_list(
+        'slot_id', 'start_time', 'end_time', 'duration', 'total_price')
+    for booking in bookings:
+        for key, delta in booking_contributions(*booking).items():
+            for field, value in delta.items():
+                totals[key][field] += value
+
+    if not totals:
+        return
+
+    with transaction.atomic():
+        SlotDailyStats.objects.bulk_create(
+            [SlotDailyStats(slot_id=slot_id, date=date) for slot_id, date in totals], ignore_conflicts=True)
+
+        keys = Q()
+        for slot_id, date in totals:
+            keys |= Q(slot_id=slot_id, date=date)
+        rows = list(SlotDailyStats.objects.select_for_update().filter(keys))
+        for row in rows:
+            for field, value in totals[(row.slot_id, row.date)].items():
+                setattr(row, field, getattr(row, field) + value)
+        SlotDailyStats.objects.bulk_update(rows, ['bookings', 'booked_duration', 'booked_minutes', 'revenue'])
+
+
+def rebuild_slot_stats(slot_ids=None):
+    """
+    Recompute the rollups from paid bookings, one slot at a time.
+    Returns the number of rollup rows written.
+    """
+    bookings = Booking.objects.filter(is_paid=True)
+    stats = SlotDailyStats.objects.all()
+    if slot_ids is not None:
+        bookings = bookings.filter(slot_id__in=slot_ids)
+        stats = stats.filter(slot_id__in=slot_ids)
+
+    written = 0
+    rows = {}
+
+    def flush():
+        nonlocal written
+        SlotDailyStats.objects.bulk_create(rows.values(), batch_size=1000)
+        written += len(rows)
+        rows.clear()
+
+    with transaction.atomic():
+        stats.delete()
+        current_slot = None
+        for booking in bookings.order_by('slot_id').values_list(
+                'slot_id', 'start_time', 'end_time', 'duration', 'total_price').iterator(chunk_size=2000):
+            if booking[0] != current_slot:
+                flush()
+                current_slot = booking[0]
+
+            for (slot_id, date), delta in booking_contributions(*booking).items():
+                row = rows.setdefault(date, SlotDailyStats(slot_id=slot_id, date=date))
+                for field, value in delta.items():
+                    setattr(row, field, getattr(row, field) + value)
+        flush()
+
+    return written
+
+
+def slot_stats(slot, from_date, to_date, period='day'):
+    """
+    Occupancy, revenue and average duration of a slot per day or week, read from the rollups only.
+    """
+    stats = SlotDailyStats.objects.filter(slot=slot, date__range=(from_date, to_date))
+    if period == 'week':
+        stats = stats.annotate(period=TruncWeek('date'))
+    else:
+        stats = stats.annotate(period=F('date'))
+
+    rows = stats.values('period').annotate(
+        total_bookings=Sum('bookings'), total_duration=Sum('booked_duration'),
+        total_minutes=Sum('booked_minutes'), total_revenue=Sum('revenue')).order_by('period')
+
+    data = []
+    for row in rows:
+        days = 1
+        if period == 'week':
+            # weeks clipped by the range only count the days inside it
+            days = (min(row['period'] + timedelta(days=6), to_date) - max(row['period'], from_date)).days + 1
+        data.append({
+            'period': row['period'],
+            'bookings': row['total_bookings'],
+            'booked_minutes': round(row['total_minutes'], 2),
+            'occupancy_rate': round(row['total_minutes'] / (days * 24 * 60), 4),
+            'revenue': round(row['total_revenue'], 2),
+            'average_duration_minutes': (
+                round(row['total_duration'] / row['total_bookings'], 2) if row['total_bookings'] else 0),
+        })
+    return data
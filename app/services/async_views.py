@@ -0,0 +1,12 @@
+from adrf.views import APIView
+from adrf.viewsets import ViewSetMixin
+from rest_framework import generics
+
+
+class AsyncGenericViewSet(ViewSetMixin, APIView, generics.GenericAPIView):
+    """
+    GenericViewSet whose actions may be coroutines.
+    adrf provides the async dispatch (authentication and permissions run in a worker thread),
+    DRF the querysets, filter backends and pagination. Sync actions still work, they run in a thread.
+    """
+    view_is_async = True
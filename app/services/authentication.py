@@ -0,0 +1,82 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Per-process LRU of authenticated users with a TTL, keyed by user id.
+    Entries are dropped by the User signals in app.signals when the user is saved or deleted in this
+    process; saves in other processes (or queryset updates) are picked up once the TTL runs out.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """
+        A copy of the cached user, so requests never share a mutable instance, or None.
+        """
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                self.users.pop(user_id, None)
+                self.misses += 1
+                return None
+            self.users.move_to_end(user_id)
+            self.hits += 1
+            return copy.copy(entry[0])
+
+    def set(self, user_id, user):
+        if settings.AUTH_USER_CACHE_TTL_SECONDS <= 0:
+            return
+        with self.lock:
+            self.users[user_id] = (copy.copy(user), time.monotonic() + settings.AUTH_USER_CACHE_TTL_SECONDS)
+            self.users.move_to_end(user_id)
+            while len(self.users) > settings.AUTH_USER_CACHE_MAX_ENTRIES:
+                self.users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'db_lookups': self.misses,
+                'db_hit_rate': round(self.misses / total, 4) if total else 0,
+                'size': len(self.users),
+            }
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that looks the token's user up in user_cache before the database.
+    The token signature and expiry are still verified on every request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return user
@@ -0,0 +1,144 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+
+from app.models import Booking, ParkSlot
+from app.services import response_cache
+
+
+def blocking_bookings():
+    """
+    Bookings that make their slot unavailable: paid ones, and unpaid ones whose checkout is still open.
+    Expired, failed and cancelled checkouts are deactivated (is_active=False) and free the slot again.
+    Lookups below are range scans of the partial booking_slot_window_idx (slot, end_time, start_time),
+    so they only touch bookings ending after the window starts, however long the history grows.
+    """
+    return Booking.objects.filter(is_active=True)
+
+
+def overlapping(start_time, end_time):
+    return blocking_bookings().filter(end_time__gt=start_time, start_time__lt=end_time)
+
+
+def has_conflict(slot_id, start_time, end_time):
+    """
+    Whether any booking of the slot overlaps [start_time, end_time).
+    """
+    return overlapping(start_time, end_time).filter(slot_id=slot_id).exists()
+
+
+async def ahas_conflict(slot_id, start_time, end_time):
+    return await overlapping(start_time, end_time).filter(slot_id=slot_id).aexists()
+
+
+def lock_slots(slot_ids):
+    """
+    Take the reservation lock of each slot by bumping its reservation_version, in id order so that
+    two transactions locking overlapping sets of slots cannot deadlock. Must run inside a transaction.
+    Concurrent reservations of a slot queue up on its row lock and see each other's bookings once the
+    previous one committed; reservations of other slots lock other rows and do not wait.
+    On SQLite, which has a single writer, the first write is also what takes the database write lock;
+    reading before it would let a concurrent transaction commit in between and fail ours on upgrade.
+    Returns whether every slot exists.
+    """
+    return all(ParkSlot.objects.filter(pk=slot_id).update(reservation_version=F('reservation_version') + 1)
+               for slot_id in sorted(set(slot_ids)))
+
+
+def reserve(slot_id, start_time, end_time, **fields):
+    """
+    Atomically check the window and create the booking holding it.
+    Returns the booking, or None when the window overlaps another booking or the slot does not exist.
+    """
+    with transaction.atomic():
+        if not lock_slots([slot_id]) or has_conflict(slot_id, start_time, end_time):
+            return None
+        return Booking.objects.create(slot_id=slot_id, start_time=start_time, end_time=end_time, **fields)
+
+
+def conflicting(windows):
+    """
+    Those of the (slot_id, start_time, end_time) windows that overlap a booking, in a single query.
+    """
+    if not windows:
+        return []
+    taken = blocking_bookings().filter(reduce(or_, (
+        Q(slot_id=slot_id, end_time__gt=start_time, start_time__lt=end_time)
+        for slot_id, start_time, end_time in windows
+    ))).values_list('slot_id', 'start_time', 'end_time')
+    return [
+        window for window in windows
+        if any(slot_id == window[0] and end > window[1] and start < window[2] for slot_id, start, end in taken)
+    ]
+
+
+def overlap_each_other(windows):
+    """
+    Whether any two of the (slot_id, start_time, end_time) windows overlap.
+    """
+    last_slot_id = last_end = None
+    for slot_id, start_time, end_time in sorted(windows):
+        if slot_id == last_slot_id and start_time < last_end:
+            return True
+        if slot_id != last_slot_id or end_time > last_end:
+            last_slot_id, last_end = slot_id, end_time
+    return False
+
+
+def reserve_many(bookings):
+    """
+    All-or-nothing reserve() of many unsaved bookings: one conflict query and one bulk insert,
+    in one transaction. Returns (saved bookings, conflicting windows); the bookings are None when
+    nothing was reserved, which without conflicting windows means a slot does not exist.
+    """
+    windows = [(booking.slot_id, booking.start_time, booking.end_time) for booking in bookings]
+    with transaction.atomic():
+        if not lock_slots(slot_id for slot_id, _, _ in windows):
+            return None, []
+        conflicts = conflicting(windows)
+        if conflicts:
+            return None, conflicts
+        bookings = Booking.objects.bulk_create(bookings)
+        # bulk_create sends no post_save
+        transaction.on_commit(response_cache.invalidate)
+    return bookings, []
+
+
+def slots_availability(slot_ids, start_time, end_time):
+    """
+    Free/booked status of many slots for one window, in a single query.
+    Returns {slot_id: is_free} for the slots that exist.
+    """
+    busy = overlapping(start_time, end_time).filter(slot_id=OuterRef('pk'))
+    slots = ParkSlot.objects.filter(id__in=slot_ids).annotate(busy=Exists(busy)).values_list('id', 'busy')
+    return {slot_id: not is_busy for slot_id, is_busy in slots}
+
+
+def free_windows(slot_id, start_time, end_time):
+    """
+    Free (start, end) windows of a slot between start_time and end_time.
+    """
+    bookings = (overlapping(start_time, end_time).filter(slot_id=slot_id)
+                .order_by('start_time').values_list('start_time', 'end_time'))
+
+    windows = []
+    cursor = start_time
+    for booking_start, booking_end in bookings:
+        if booking_start > cursor:
+            windows.append((cursor, booking_start))
+        cursor = max(cursor, booking_end)
+
+    if cursor < end_time:
+        windows.append((cursor, end_time))
+    return windows
+
+
+def double_booked(bookings):
+    """
+    Those of bookings that overlap another blocking booking of the same slot. Should always be empty.
+    """
+    others = overlapping(OuterRef('start_time'), OuterRef('end_time')).filter(
+        slot_id=OuterRef('slot_id')).exclude(pk=OuterRef('pk'))
+    return bookings.filter(Exists(others))
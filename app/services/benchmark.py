@@ -0,0 +1,204 @@
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import django
+import requests
+from django.db import connection, connections
+from django.test import Client
+from django.utils import timezone
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not values:
+        return None
+    rank = math.ceil(pct / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def latency_summary(seconds):
+    """
+    mean/p50/p95/p99/max in milliseconds.
+    """
+    values = sorted(value * 1000 for value in seconds)
+    if not values:
+        return {}
+    return {
+        'mean': round(sum(values) / len(values), 3),
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(values[-1], 3),
+    }
+
+
+class Recorder:
+    """
+    Thread-safe latency and status collector, keyed by operation name.
+    A status of None means the call raised instead of answering.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, seconds, status):
+        with self.lock:
+            self.latencies[name].append(seconds)
+            self.statuses[name][str(status) if status is not None else 'exception'] += 1
+
+    def timed(self, name, call):
+        """
+        Run call(), record its latency and returned status code, and pass its result through.
+        """
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            self.record(name, time.perf_counter() - started, None)
+            raise
+        self.record(name, time.perf_counter() - started, getattr(result, 'status_code', 200))
+        return result
+
+    def summary(self, elapsed):
+        def section(latencies, statuses):
+            return {
+                'requests': len(latencies),
+                'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+                'errors': sum(count for status, count in statuses.items()
+                              if status == 'exception' or status.startswith('5')),
+                'status_codes': dict(sorted(statuses.items())),
+                'latency_ms': latency_summary(latencies),
+            }
+
+        with self.lock:
+            total_statuses = defaultdict(int)
+            for statuses in self.statuses.values():
+                for status, count in statuses.items():
+                    total_statuses[status] += count
+            return {
+                'endpoints': {name: section(self.latencies[name], self.statuses[name])
+                              for name in sorted(self.latencies)},
+                'total': section([value for values in self.latencies.values() for value in values], total_statuses),
+            }
+
+
+class InProcessTransport:
+    """
+    Runs requests through the Django handler in this process, one test client per thread.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, path, token, data=None):
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client(raise_request_exception=False)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        if method == 'GET':
+            return self.local.client.get(path, data, **headers)
+        return self.local.client.post(path, data, content_type='application/json', **headers)
+
+
+class HttpTransport:
+    """
+    Sends requests to a running server, one keep-alive session per thread.
+    """
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def request(self, method, path, token, data=None):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        if method == 'GET':
+            return self.local.session.get(self.base_url + path, params=data, headers=headers, timeout=self.timeout)
+        return self.local.session.post(self.base_url + path, json=data, headers=headers, timeout=self.timeout)
+
+
+def run_concurrently(task, concurrency, requests=None, duration=None, seed=None):
+    """
+    Call task(rnd) from concurrency threads until requests calls were made or duration seconds passed.
+    Every thread gets its own seeded random.Random and closes its database connections when done.
+    Exceptions from task are swallowed; record them through a Recorder. Returns the elapsed seconds.
+    """
+    issued = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def more():
+        nonlocal issued
+        with lock:
+            if requests is not None and issued >= requests:
+                return False
+            issued += 1
+        return deadline is None or time.perf_counter() < deadline
+
+    def worker(index):
+        rnd = random.Random(None if seed is None else seed + index)
+        try:
+            while more():
+                try:
+                    task(rnd)
+                except Exception:
+                    pass
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return time.perf_counter() - started
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'database': connection.vendor,
+        'git_commit': git_commit(),
+    }
+
+
+def default_report_path(name):
+    return f'{name}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.bench.json'
+
+
+def write_report(path, name, config, results, **extra):
+    """
+    Write one benchmark run as JSON, so runs can be diffed and compared over time.
+    """
+    report = {
+        'benchmark': name,
+        'created_at': timezone.now().isoformat(),
+        'environment': environment(),
+        'config': config,
+        **extra,
+        **results,
+    }
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2, default=str)
+    return report
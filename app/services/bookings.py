@@ -0,0 +1,138 @@
+import csv
+import json
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, CharField, F, OuterRef, Subquery, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from app.models import Booking, Rating
+from app.services.custom_pagination import BookingCursorPagination
+
+LEDGER_FIELDS = [
+    'id', 'user_email', 'start_time', 'end_time', 'duration_minutes', 'total_price', 'booked', 'is_paid',
+    'status', 'rating',
+]
+
+
+def with_booking_status(queryset, now=None):
+    """
+    Annotate Booked/Expired in SQL instead of comparing end_time per row in Python.
+    """
+    now = now or timezone.now()
+    return queryset.annotate(booking_status=Case(
+        When(end_time__gt=now, then=Value('Booked')),
+        default=Value('Expired'),
+        output_field=CharField(),
+    ))
+
+
+def filter_bookings(queryset, params, now=None):
+    """
+    Apply the status (Booked/Expired) and from_date/to_date (YYYY-MM-DD, inclusive) query params.
+    Raises ValueError on invalid values.
+    """
+    now = now or timezone.now()
+
+    booking_status = params.get('status')
+    if booking_status == 'Booked':
+        queryset = queryset.filter(end_time__gt=now)
+    elif booking_status == 'Expired':
+        queryset = queryset.filter(end_time__lte=now)
+    elif booking_status:
+        raise ValueError('status should be Booked or Expired.')
+
+    for param, lookup, offset in (('from_date', 'start_time__gte', 0), ('to_date', 'start_time__lt', 1)):
+        if not params.get(param):
+            continue
+        date = parse_date(params[param])
+        if not date:
+            raise ValueError(f'{param} should be YYYY-MM-DD.')
+        queryset = queryset.filter(**{
+            lookup: timezone.make_aware(datetime.combine(date + timedelta(days=offset), time.min))})
+
+    return queryset
+
+
+def ledger_page(slot, request):
+    """
+    One cursor page of a slot's bookings for its owner, in a constant number of queries.
+    Returns (data, paginator).
+    """
+    bookings = filter_bookings(Booking.objects.filter(slot=slot, booked=True), request.query_params)
+    bookings = with_booking_status(bookings).annotate(user_email=F('user__email'))
+
+    paginator = BookingCursorPagination()
+    page = paginator.paginate_queryset(bookings, request)
+
+    ratings = dict(Rating.objects.filter(
+        slot=slot, user_id__in={booking.user_id for booking in page}).values_list('user_id', 'rating'))
+
+    data = []
+    for booking in page:
+        data.append({
+            'id': booking.id,
+            'user_email': booking.user_email,
+            'start_time': booking.start_time,
+            'end_time': booking.end_time,
+            'duration_minutes': booking.duration,
+            'total_price': booking.total_price,
+            'booked': booking.booked,
+            'is_paid': booking.is_paid,
+            'status': booking.booking_status,
+            'rating': ratings.get(booking.user_id)
+        })
+    return data, paginator
+
+
+def ledger_rows(slot, params):
+    """
+    All ledger rows of a slot as tuples in LEDGER_FIELDS order, streamed from a server-side iterator.
+    """
+    rating = Rating.objects.filter(slot=slot, user=OuterRef('user')).values('rating')[:1]
+    bookings = filter_bookings(Booking.objects.filter(slot=slot, booked=True), params)
+    bookings = with_booking_status(bookings).annotate(
+        user_email=F('user__email'), duration_minutes=F('duration'), rating=Subquery(rating))
+
+    return bookings.order_by('-start_time', '-id').values_list(
+        'id', 'user_email', 'start_time', 'end_time', 'duration_minutes', 'total_price', 'booked', 'is_paid',
+        'booking_status', 'rating').iterator(chunk_size=2000)
+
+
+class _Echo:
+    """
+    File-like object that hands back what csv.writer writes to it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(LEDGER_FIELDS)
+    for row in rows:
+        yield writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(LEDGER_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def spool(chunks):
+    """
+    Write str chunks of an export to a rewound temporary file, kept in memory up to EXPORT_SPOOL_MAX_BYTES.
+    Exports are read from the database here, in the view's thread: under ASGI, Django 4.1 iterates a
+    streaming response on the event loop, where a lazy queryset raises SynchronousOnlyOperation.
+    Streaming the spooled file back only reads the file.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES)
+    for chunk in chunks:
+        spooled.write(chunk.encode())
+    spooled.seek(0)
+    return spooled
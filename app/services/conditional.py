@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.request import Request
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag over the request path, query, negotiated format and the given state.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = '|'.join(str(part) for part in (request.get_full_path(), getattr(renderer, 'format', ''), *parts))
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def _not_modified(request, etag, last_modified):
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None and etag:
+        not_modified['ETag'] = etag
+    return not_modified
+
+
+def _with_validators(response, etag, last_modified):
+    if response.status_code == 200 and etag:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def conditional(validators):
+    """
+    ETag/Last-Modified support for DRF views and viewset methods, sync or async.
+    validators is called with the view arguments and returns (etag, last_modified datetime or None),
+    computed from cheap aggregates instead of the serialized body. Matching requests get 304.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                request = next(arg for arg in args if isinstance(arg, Request))
+                etag, last_modified = await sync_to_async(validators)(*args, **kwargs)
+                last_modified = int(last_modified.timestamp()) if last_modified else None
+
+                not_modified = _not_modified(request, etag, last_modified)
+                if not_modified is not None:
+                    return not_modified
+                return _with_validators(await view(*args, **kwargs), etag, last_modified)
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            etag, last_modified = validators(*args, **kwargs)
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+
+            not_modified = _not_modified(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            return _with_validators(view(*args, **kwargs), etag, last_modified)
+
+        return wrapper
+
+    return decorator
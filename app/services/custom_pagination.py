@@ -1,7 +1,17 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 50
+
+
+class BookingCursorPagination(CursorPagination):
+    """
+    Keyset pagination over bookings, newest first.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-start_time', '-id')
@@ -0,0 +1,77 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeKhaltiHandler(BaseHTTPRequestHandler):
+    """
+    Answers the two Khalti ePayment calls parkO makes (initiate and lookup) with canned responses.
+    """
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        payload = json.loads(body or b'{}')
+        time.sleep(server.latency)
+
+        if self.path.rstrip('/').endswith('/epayment/initiate'):
+            pidx = uuid.uuid4().hex
+            data = {'pidx': pidx, 'payment_url': f'{server.base_url}/pay/{pidx}/', 'expires_in': 1800}
+        elif self.path.rstrip('/').endswith('/epayment/lookup'):
+            completed = server.random.random() < server.success_ratio
+            data = {
+                'pidx': payload.get('pidx'),
+                'status': 'Completed' if completed else 'Pending',
+                'transaction_id': uuid.uuid4().hex if completed else None,
+            }
+        else:
+            self.send_error(404)
+            return
+
+        content = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeKhaltiGateway(ThreadingHTTPServer):
+    """
+    Local stand-in for Khalti, for benchmarks. Point KHALTI_BASE_URL at base_url.
+    latency is seconds added to every call; success_ratio is the share of lookups that report Completed.
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, success_ratio=1.0, seed=None):
+        super().__init__((host, port), FakeKhaltiHandler)
+        self.latency = latency
+        self.success_ratio = success_ratio
+        self.random = random.Random(seed)
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,121 @@
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+MAX_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+
+
+def parse_coordinates(coordinates):
+    """
+    Parse "lat,lng" (comma or whitespace separated) into floats.
+    Returns (None, None) when the value is missing or out of range.
+    """
+    if not coordinates:
+        return None, None
+
+    parts = coordinates.replace(',', ' ').split()
+    if len(parts) != 2:
+        return None, None
+
+    try:
+        lat, lng = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None, None
+
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None, None
+    return lat, lng
+
+
+def encode_geohash(lat, lng, precision=MAX_PRECISION):
+    """
+    Encode a point as a geohash string.
+    Points in the same cell share a prefix, so a cell is a contiguous range of the index.
+    """
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, bit_count, even = 0, 0, True
+
+    while len(geohash) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = bits * 2 + 1
+                lng_range[0] = mid
+            else:
+                bits = bits * 2
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = bits * 2 + 1
+                lat_range[0] = mid
+            else:
+                bits = bits * 2
+                lat_range[1] = mid
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits, bit_count = 0, 0
+
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    """
+    Height and width of a geohash cell in degrees.
+    """
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180 / 2 ** lat_bits, 360 / 2 ** lng_bits
+
+
+def degree_span(lat, radius_km):
+    """
+    Latitude and longitude span (in degrees) of the circle of radius_km around lat, exact on the sphere.
+    The longitude span is 180 when the circle reaches a pole, i.e. covers every longitude.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_span = math.degrees(angle)
+    cos_lat = math.cos(math.radians(lat))
+    if abs(lat) + lat_span >= 90 or math.sin(angle) >= cos_lat:
+        return lat_span, 180
+    return lat_span, math.degrees(math.asin(math.sin(angle) / cos_lat))
+
+
+def covering_cells(lat, lng, radius_km):
+    """
+    Geohash prefixes whose cells cover the circle around (lat, lng).
+    The precision is the finest one whose cell is at least as large as the radius,
+    so the centre cell and its eight neighbours are always enough; neighbours wrap around the antimeridian.
+    When no cell is that large, e.g. for circles around a pole, returns [''], the prefix of every cell.
+    """
+    lat_span, lng_span = degree_span(lat, radius_km)
+
+    for precision in range(MAX_PRECISION, 0, -1):
+        cell_lat, cell_lng = cell_size(precision)
+        if cell_lat >= lat_span and cell_lng >= lng_span:
+            break
+    else:
+        return ['']
+
+    cell_lat, cell_lng = cell_size(precision)
+    cells = set()
+    for d_lat in (-cell_lat, 0, cell_lat):
+        for d_lng in (-cell_lng, 0, cell_lng):
+            n_lat = min(max(lat + d_lat, -90), 90)
+            n_lng = (lng + d_lng + 180) % 360 - 180
+            cells.add(encode_geohash(n_lat, n_lng, precision))
+
+    return sorted(cells)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    Great-circle distance between two points in kilometres.
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
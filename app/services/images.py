@@ -0,0 +1,97 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def render_variants(source, sizes, quality):
+    """
+    Write resized copies of the image at path source next to it, in a variants/ directory.
+    Runs in a pool process, so it only uses Pillow and the paths it is given.
+    EXIF (camera, GPS) is dropped; its orientation is applied to the pixels first.
+    Returns {variant: path relative to the source directory}.
+    """
+    fmt, extension = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    os.makedirs(os.path.join(directory, 'variants'), exist_ok=True)
+
+    variants = {}
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if fmt == 'JPEG' and image.mode == 'RGBA':
+            image = image.convert('RGB')
+
+        # largest first, so each smaller variant is resampled from fewer pixels
+        for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+            # size and quality are part of the name, so a content-addressed source keeps immutable variants
+            relative = f'variants/{stem}-{size}q{quality}.{extension}'
+            variants[name] = relative
+            if os.path.exists(os.path.join(directory, relative)):
+                continue  # rendered for an identical upload already
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            image.save(os.path.join(directory, relative), fmt, quality=quality, method=4)
+    return variants
+
+
+def pool():
+    """
+    This process's image pool, started on first use. Pool processes are spawned, not forked,
+    so they never inherit the threads or database connections of the web worker.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS, mp_context=get_context('spawn'))
+        return _pool
+
+
+def variant_names(field_file, variants):
+    """
+    {variant: storage name} of a picture's rendered variants.
+    """
+    directory = os.path.dirname(field_file.name)
+    return {name: f'{directory}/{relative}' for name, relative in variants.items()}
+
+
+def process_picture(instance, field, variants_field):
+    """
+    Render the variants of instance.<field> in the pool once the current transaction commits,
+    then store their names in instance.<variants_field>. Returns immediately.
+    """
+    field_file = getattr(instance, field)
+    if not field_file:
+        return
+
+    model, pk, name = type(instance), instance.pk, field_file.name
+
+    def store(future):
+        try:
+            variants = variant_names(field_file, future.result())
+            # skip if the picture was replaced meanwhile; its own job stores its variants
+            current = model._default_manager.filter(pk=pk, **{field: name}).first()
+            if current is not None:
+                setattr(current, variants_field, variants)
+                # saved through the model so the slot response and user caches are invalidated
+                current.save(update_fields=[variants_field, 'updated_at'])
+        except Exception as e:
+            print(e)
+        finally:
+            connection.close()
+
+    def submit():
+        future = pool().submit(
+            render_variants, field_file.path, settings.IMAGE_VARIANTS, settings.IMAGE_VARIANT_QUALITY)
+        # in a thread of its own: a callback may run in whichever thread completes the future
+        future.add_done_callback(lambda done: threading.Thread(target=store, args=(done,), daemon=True).start())
+
+    transaction.on_commit(submit)
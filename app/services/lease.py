@@ -0,0 +1,82 @@
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError, connection
+from django.db.models import Case, F, Q, When
+from django.db.models.functions import Now
+
+from app.models import WorkerLease
+
+
+class Lease:
+    """
+    A named lease in the database that at most one holder owns at a time.
+    Taking and renewing it is a single conditional UPDATE (held by us, or expired), so two
+    instances can never both succeed, and expiry is judged by the database clock rather than by
+    the clocks of the competing hosts. A holder that dies simply stops renewing; the lease is
+    free again ttl seconds after its last renewal.
+    """
+
+    def __init__(self, name, ttl, holder=None):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl)
+        self.holder = holder or f'{socket.gethostname()}:{os.getpid()}:{id(self):x}'
+
+    def acquire(self):
+        """
+        Take the lease if it is free or expired, or renew it if we hold it. Returns whether we hold it now.
+        """
+        WorkerLease.objects.get_or_create(name=self.name, defaults={'expires_at': Now()})
+        return WorkerLease.objects.filter(
+            Q(holder=self.holder) | Q(expires_at__lte=Now()), name=self.name,
+        ).update(
+            acquired_at=Case(When(holder=self.holder, then=F('acquired_at')), default=Now()),
+            holder=self.holder,
+            expires_at=Now() + self.ttl,
+        ) == 1
+
+    def release(self):
+        """
+        Give the lease up so a standby instance can take over right away.
+        """
+        WorkerLease.objects.filter(name=self.name, holder=self.holder).update(expires_at=Now())
+
+    @contextmanager
+    def keep_alive(self, interval=None):
+        """
+        Renew the lease from a background thread while the block runs.
+        Yields an Event that is set once the lease is lost, i.e. someone else took it or it could not be
+        renewed before expiring. Work in the block should check it between units of work and stop.
+        """
+        interval = interval or self.ttl.total_seconds() / 3
+        lost, done = threading.Event(), threading.Event()
+
+        def heartbeat():
+            deadline = time.monotonic() + self.ttl.total_seconds()
+            try:
+                while not done.wait(interval):
+                    try:
+                        if not self.acquire():
+                            lost.set()
+                            return
+                        deadline = time.monotonic() + self.ttl.total_seconds()
+                    except DatabaseError:
+                        # e.g. a locked database; only give up once the lease may have expired
+                        if time.monotonic() >= deadline:
+                            lost.set()
+                            return
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=heartbeat, name=f'lease-{self.name}', daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            done.set()
+            thread.join()
+
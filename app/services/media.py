@@ -0,0 +1,106 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from app.services.storage import is_content_addressed
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def byte_range(header, size):
+    """
+    (start, end) inclusive of a single-range Range header; None to send the whole file
+    (no header, or several ranges), 'unsatisfiable' for a range outside the file.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start > end or start >= size:
+        return 'unsatisfiable'
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    """
+    Serve a file from MEDIA_ROOT with validators, long-lived caching for content-addressed names,
+    and single byte ranges. With MEDIA_SERVE_MODE x-accel or x-sendfile the front server sends the
+    bytes (and handles ranges) and this view only answers with headers.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404('File not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found.')
+
+    immutable = is_content_addressed(path)
+    etag = quote_etag(os.path.splitext(os.path.basename(path))[0] if immutable
+                      else f'{int(stat.st_mtime)}-{stat.st_size}')
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    content_type, encoding = mimetypes.guess_type(full_path)
+
+    if not_modified is not None:
+        response = not_modified
+    elif settings.MEDIA_SERVE_MODE in ('x-accel', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+        if settings.MEDIA_SERVE_MODE == 'x-accel':
+            # a URI for nginx: legacy names may hold spaces, % or non-ASCII characters
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(path.lstrip('/'))
+        else:
+            # mod_xsendfile unescapes the path (XSendFileUnescape is on by default)
+            response['X-Sendfile'] = quote(full_path)
+    else:
+        requested = byte_range(request.headers.get('Range'), stat.st_size)
+        # If-Range: only send the part if the client's copy is still current
+        if requested and request.headers.get('If-Range', etag) != etag:
+            requested = None
+
+        if requested == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif requested:
+            start, end = requested
+            response = StreamingHttpResponse(
+                read_range(full_path, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+            response['Content-Length'] = stat.st_size
+        response['Accept-Ranges'] = 'bytes'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = ('public, max-age=31536000, immutable' if immutable
+                                 else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}')
+    return response
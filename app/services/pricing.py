@@ -0,0 +1,123 @@
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+RATE_TABLE_KEYS = {'tiers', 'bands', 'daily_max'}
+
+
+def parse_time(value):
+    hours, minutes = value.split(':')
+    return time(int(hours), int(minutes))
+
+
+def _non_negative(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+
+
+def validate_rate_table(table):
+    """
+    Check a slot's rate table. All keys are optional; an empty table charges the hourly price flat.
+      tiers      [{"after_hours": 3, "multiplier": 0.8}]  hours of a stay past after_hours cost multiplier x price
+      bands      [{"start": "07:00", "end": "10:00", "multiplier": 1.5}]  time-of-day rates, may wrap midnight;
+                 the first matching band wins
+      daily_max  250  the most one calendar day of a stay costs
+    Returns the table. Raises ValueError with a message for the provider.
+    """
+    if not isinstance(table, dict) or not set(table) <= RATE_TABLE_KEYS:
+        raise ValueError(f'rate_table must be an object with any of {", ".join(sorted(RATE_TABLE_KEYS))}.')
+    try:
+        for tier in table.get('tiers', []):
+            if set(tier) != {'after_hours', 'multiplier'} or not _non_negative(tier['after_hours']) \
+                    or not _non_negative(tier['multiplier']):
+                raise ValueError
+        for band in table.get('bands', []):
+            if set(band) != {'start', 'end', 'multiplier'} or not _non_negative(band['multiplier']) \
+                    or parse_time(band['start']) == parse_time(band['end']):
+                raise ValueError
+        if table.get('daily_max') is not None and not (_non_negative(table['daily_max']) and table['daily_max'] > 0):
+            raise ValueError
+    except (AttributeError, KeyError, TypeError, ValueError):
+        raise ValueError('rate_table tiers need after_hours and multiplier, bands start and end (HH:MM, different) '
+                         'and multiplier, all non-negative numbers, and daily_max must be a positive number.')
+    return table
+
+
+def _band_multiplier(bands, moment):
+    for start, end, multiplier in bands:
+        inside = start <= moment < end if start < end else (moment >= start or moment < end)
+        if inside:
+            return multiplier
+    return 1
+
+
+def _tier_multiplier(tiers, elapsed_hours):
+    multiplier = 1
+    for after_hours, tier_multiplier in tiers:
+        if elapsed_hours >= after_hours:
+            multiplier = tier_multiplier
+    return multiplier
+
+
+def day_factors(start_time, end_time, table):
+    """
+    Price of [start_time, end_time) under the table's tiers and bands per local calendar day,
+    in units of the slot's hourly price. Prices are linear in the hourly price until daily_max
+    applies, so slots sharing a table share these factors.
+    """
+    tiers = sorted((float(tier['after_hours']), float(tier['multiplier'])) for tier in table.get('tiers', []))
+    bands = [(parse_time(band['start']), parse_time(band['end']), float(band['multiplier']))
+             for band in table.get('bands', [])]
+    start, end = timezone.localtime(start_time), timezone.localtime(end_time)
+
+    # every moment the rate can change: midnights, band edges and tier thresholds
+    edges = {start, end}
+    day = start.date()
+    while day <= end.date():
+        for moment in [time(0)] + [edge for band in bands for edge in band[:2]]:
+            edges.add(timezone.make_aware(datetime.combine(day, moment), start.tzinfo))
+        day += timedelta(days=1)
+    edges.update(start + timedelta(hours=after_hours) for after_hours, _ in tiers)
+    edges = sorted(edge for edge in edges if start <= edge <= end)
+
+    factors = defaultdict(float)
+    for segment_start, segment_end in zip(edges, edges[1:]):
+        hours = (segment_end - segment_start).total_seconds() / 3600
+        elapsed = (segment_start - start).total_seconds() / 3600
+        factors[segment_start.date()] += (
+            hours * _band_multiplier(bands, segment_start.time()) * _tier_multiplier(tiers, elapsed))
+    return dict(factors)
+
+
+def price_from_factors(price, factors, table):
+    daily_max = table.get('daily_max')
+    days = [price * factor for factor in factors.values()]
+    if daily_max is not None:
+        days = [min(day, float(daily_max)) for day in days]
+    return max(round(sum(days), 2), settings.BOOKING_MINIMUM_PRICE)
+
+
+def quote(price, table, start_time, end_time):
+    """
+    Total price of booking a slot with hourly price and rate table for [start_time, end_time).
+    """
+    return price_from_factors(price, day_factors(start_time, end_time, table or {}), table or {})
+
+
+def quote_many(slots, start_time, end_time):
+    """
+    Prices of one window for many (slot_id, price, rate_table) slots: the window is split and
+    weighted once per distinct rate table, and each slot only scales those factors by its price.
+    Returns {slot_id: total price}.
+    """
+    factors_by_table = {}
+    quotes = {}
+    for slot_id, price, table in slots:
+        table = table or {}
+        key = repr(table)
+        if key not in factors_by_table:
+            factors_by_table[key] = day_factors(start_time, end_time, table)
+        quotes[slot_id] = price_from_factors(price, factors_by_table[key], table)
+    return quotes
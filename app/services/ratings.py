@@ -0,0 +1,43 @@
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from app.models import ParkSlot, Rating
+
+
+def apply_rating_delta(slot_id, count_delta, total_delta):
+    """
+    Apply a rating change to the slot aggregates in a single UPDATE.
+    The new values are computed from the row itself, so concurrent raters never lose updates.
+    """
+    new_count = F('rating_count') + count_delta
+    new_total = F('rating_total') + total_delta
+
+    ParkSlot.objects.filter(pk=slot_id).update(
+        rating_count=new_count,
+        rating_total=new_total,
+        rating_avg=Case(
+            When(rating_count__lte=-count_delta, then=Value(0.0)),
+            default=new_total * 1.0 / new_count,
+            output_field=FloatField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild_rating_aggregates(queryset=None):
+    """
+    Recompute the slot aggregates from the Rating table.
+    """
+    if queryset is None:
+        queryset = ParkSlot.objects.all()
+
+    ratings = Rating.objects.filter(slot=OuterRef('pk')).order_by().values('slot')
+    count = Coalesce(Subquery(ratings.annotate(c=Count('id')).values('c')), 0, output_field=IntegerField())
+    total = Coalesce(Subquery(ratings.annotate(t=Sum('rating')).values('t')), 0, output_field=IntegerField())
+
+    return queryset.update(
+        rating_count=count,
+        rating_total=total,
+        rating_avg=Coalesce(total * 1.0 / NullIf(count, 0), 0.0, output_field=FloatField()),
+    )
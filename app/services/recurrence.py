@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.utils.dateparse import parse_date
+
+FREQUENCIES = {'daily': 1, 'weekly': 7}
+
+
+def expand(start_time, end_time, recurrence, limit):
+    """
+    Windows of a recurring booking: [start_time, end_time) repeated per recurrence, a dict of
+    frequency (daily/weekly), interval (default 1), weekdays (0 is Monday, weekly only; defaults to
+    the weekday of start_time), and count and/or until (YYYY-MM-DD, inclusive).
+    Raises ValueError on an invalid rule or one that yields more than limit windows.
+    """
+    if not isinstance(recurrence, dict) or recurrence.get('frequency') not in FREQUENCIES:
+        raise ValueError('recurrence.frequency must be daily or weekly.')
+
+    try:
+        interval = int(recurrence.get('interval', 1))
+        count = int(recurrence['count']) if recurrence.get('count') is not None else None
+        until = parse_date(recurrence['until']) if recurrence.get('until') else None
+        weekdays = {int(day) for day in recurrence.get('weekdays') or [start_time.weekday()]}
+    except (TypeError, ValueError):
+        raise ValueError('recurrence.interval, count and weekdays must be integers and until a YYYY-MM-DD date.')
+
+    if interval < 1 or (count is not None and count < 1) or not weekdays <= set(range(7)):
+        raise ValueError('recurrence.interval and count must be positive and weekdays between 0 and 6.')
+    if count is None and until is None:
+        raise ValueError('recurrence needs a count or an until date.')
+
+    # walk day by day; weekly rules skip the weeks between intervals
+    period = FREQUENCIES[recurrence['frequency']] * interval
+    first_week = start_time - timedelta(days=start_time.weekday())
+    windows = []
+    day = 0
+    while count is None or len(windows) < count:
+        start = start_time + timedelta(days=day)
+        if until and start.date() > until:
+            break
+        if recurrence['frequency'] == 'daily':
+            due = day % period == 0
+        else:
+            due = start.weekday() in weekdays and (start - first_week).days // 7 % interval == 0
+        if due:
+            if len(windows) == limit:
+                raise ValueError(f'recurrence yields more than {limit} bookings.')
+            windows.append((start, start + (end_time - start_time)))
+        day += 1
+    return windows
@@ -0,0 +1,49 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # optional, see parkO/settings/drf.py
+    msgpack = None
+
+# DRF's fallback for what orjson does not encode natively: Decimal, timedelta, lazy strings, querysets, ...
+# Datetimes are encoded natively, the same way DRF does (ISO 8601, UTC as Z).
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson: same output as DRF's stdlib encoder, several times faster.
+    Indented output is always two spaces, orjson's only indent.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=_default, option=option)
+        # like DRF, escape the separators that are valid JSON but end a line in JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    application/msgpack for the mobile apps: the JSON data model, binary and smaller.
+    Datetimes and decimals are encoded as in JSON (ISO 8601 strings, floats).
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, datetime=False)
@@ -0,0 +1,132 @@
+import asyncio
+import functools
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.response import Response
+
+VERSION_KEY = 'parkslots:version'
+
+# hit/miss counters of this process, kept out of the cache so a lookup costs no extra cache write
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def is_shared():
+    """
+    Whether the cache is shared between processes. With the per-process locmem backend, invalidations
+    from another process (e.g. run_payment_worker) never reach the web workers, whose responses then
+    stay stale for up to RESPONSE_CACHE_TIMEOUT seconds.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _initial_version():
+    # the version key can be culled like any other entry; starting over from the clock instead of 1
+    # never goes back to a version whose (possibly stale) responses are still cached
+    return time.time_ns()
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _initial_version(), None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def invalidate():
+    """
+    Drop every cached park slot response by moving to a new version; old entries just expire.
+    Call it through transaction.on_commit() inside a transaction, or a concurrent request may cache
+    the old rows under the new version before the write commits.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, _initial_version(), None)
+
+
+def cache_key(request):
+    params = sorted(request.query_params.lists())
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = f'{request.path}?{params}|{getattr(renderer, "format", "")}'
+    return f'parkslots:{current_version()}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def memoize(request, name, compute):
+    """
+    Cache a value derived from the request (e.g. conditional GET validators) alongside its response.
+    """
+    key = f'{cache_key(request)}:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.RESPONSE_CACHE_TIMEOUT)
+    return value
+
+
+def _lookup(request):
+    key = cache_key(request)
+    data = cache.get(key)
+    with _stats_lock:
+        _stats['hits' if data is not None else 'misses'] += 1
+    return key, data
+
+
+def cached_response(view_method):
+    """
+    Cache successful GET responses of a viewset method, sync or async, keyed by path and query params.
+    """
+    if asyncio.iscoroutinefunction(view_method):
+        @functools.wraps(view_method)
+        async def async_wrapper(self, request, *args, **kwargs):
+            # cache only, no database connection: no need to queue behind sync views on the worker's one thread
+            key, data = await sync_to_async(_lookup, thread_sensitive=False)(request)
+            if data is not None:
+                return Response(data)
+
+            response = await view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                await sync_to_async(cache.set, thread_sensitive=False)(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key, data = _lookup(request)
+        if data is not None:
+            return Response(data)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats['hits'] = _stats['misses'] = 0
+
+
+def cache_stats():
+    """
+    Hit/miss counters of this process, and the shared cache version.
+    """
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0,
+        'version': current_version(),
+        'shared': is_shared(),
+    }
@@ -0,0 +1,103 @@
+import re
+
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+SQLITE_TABLE = 'app_parkslot_fts'
+POSTGRES_DOCUMENT = "to_tsvector('simple', coalesce(address, '') || ' ' || coalesce(description, ''))"
+
+# the sync triggers of migration 0014
+SQLITE_TRIGGERS = {
+    'app_parkslot_fts_insert': """
+        CREATE TRIGGER app_parkslot_fts_insert AFTER INSERT ON app_parkslot BEGIN
+            INSERT INTO app_parkslot_fts(rowid, address, description) VALUES (new.id, new.address, new.description);
+        END
+    """,
+    'app_parkslot_fts_delete': """
+        CREATE TRIGGER app_parkslot_fts_delete AFTER DELETE ON app_parkslot BEGIN
+            INSERT INTO app_parkslot_fts(app_parkslot_fts, rowid, address, description)
+            VALUES ('delete', old.id, old.address, old.description);
+        END
+    """,
+    'app_parkslot_fts_update': """
+        CREATE TRIGGER app_parkslot_fts_update AFTER UPDATE OF address, description ON app_parkslot BEGIN
+            INSERT INTO app_parkslot_fts(app_parkslot_fts, rowid, address, description)
+            VALUES ('delete', old.id, old.address, old.description);
+            INSERT INTO app_parkslot_fts(rowid, address, description) VALUES (new.id, new.address, new.description);
+        END
+    """,
+}
+
+_has_search_index = {}
+
+
+def has_search_index():
+    """
+    Whether the search index of migration 0014 exists on the current database.
+    """
+    if connection.vendor not in _has_search_index:
+        if connection.vendor == 'sqlite':
+            _has_search_index['sqlite'] = SQLITE_TABLE in connection.introspection.table_names()
+        else:
+            _has_search_index[connection.vendor] = connection.vendor == 'postgresql'
+    return _has_search_index[connection.vendor]
+
+
+def restore_sqlite_triggers(using='default'):
+    """
+    Recreate missing FTS5 sync triggers and rebuild the index from app_parkslot.
+    SQLite migrations that alter app_parkslot copy it into a new table, which drops its triggers.
+    Returns the names of the triggers that were recreated.
+    """
+    target = connections[using]
+    if target.vendor != 'sqlite' or SQLITE_TABLE not in target.introspection.table_names():
+        return []
+    with target.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'app_parkslot'")
+        missing = sorted(set(SQLITE_TRIGGERS) - {name for name, in cursor.fetchall()})
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        if missing:
+            cursor.execute(f"INSERT INTO {SQLITE_TABLE}({SQLITE_TABLE}) VALUES ('rebuild')")
+    return missing
+
+
+def search_words(terms):
+    return [word for term in terms for word in re.findall(r'\w+', term)]
+
+
+class ParkSlotSearchFilter(SearchFilter):
+    """
+    Ranked, prefix-aware search over ParkSlot address and description.
+    Uses SQLite FTS5 or a Postgres tsvector GIN index; other setups fall back to icontains on search_fields.
+    Every word must match, the last one as a prefix so results update as the user types.
+    ?address= is searched like ?search=, it used to be an unindexable address__icontains filter.
+    """
+    address_param = 'address'
+
+    def get_search_terms(self, request):
+        address = request.query_params.get(self.address_param, '').replace('\x00', '').replace(',', ' ')
+        return super().get_search_terms(request) + address.split()
+
+    def filter_queryset(self, request, queryset, view):
+        words = search_words(self.get_search_terms(request))
+        if not words or not has_search_index():
+            return super().filter_queryset(request, queryset, view)
+
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'sqlite':
+            match = ' '.join(f'"{word}"' for word in words) + '*'
+            # join the index once; bm25 comes from the same MATCH, address weighted over description, lower is better
+            rank = RawSQL(f'bm25({SQLITE_TABLE}, 4.0, 1.0)', [], output_field=FloatField())
+            return queryset.extra(
+                tables=[SQLITE_TABLE], where=[f'{SQLITE_TABLE}.rowid = "{table}"."id"', f'{SQLITE_TABLE} MATCH %s'],
+                params=[match],
+            ).annotate(search_rank=rank).order_by('search_rank', '-created_at')
+
+        query = ' & '.join(words) + ':*'
+        matches = RawSQL(f"{POSTGRES_DOCUMENT} @@ to_tsquery('simple', %s)", [query], output_field=BooleanField())
+        rank = RawSQL(f"-ts_rank({POSTGRES_DOCUMENT}, to_tsquery('simple', %s))", [query], output_field=FloatField())
+        return queryset.alias(search_match=matches).filter(search_match=True).annotate(
+            search_rank=rank).order_by('search_rank', '-created_at')
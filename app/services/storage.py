@@ -0,0 +1,39 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_HASH = re.compile(r'(^|[/-])[0-9a-f]{64}([.-]|$)')
+
+
+def is_content_addressed(name):
+    """
+    Whether the stored file name carries the hash of its content, i.e. its bytes can never change.
+    """
+    return bool(CONTENT_HASH.search(os.path.basename(name)))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names every upload after the SHA-256 of its content, under the upload
+    directory: mediafiles/parkPic/ab/ab12...ef.jpg. Identical uploads are stored once, and since a
+    name always means the same bytes, they can be cached forever.
+    """
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        hashed = os.path.join(directory, digest.hexdigest()[:2], digest.hexdigest() + extension)
+        if self.exists(hashed):
+            return hashed
+        name = super()._save(hashed, content)
+        if name != hashed:
+            # the same content was saved concurrently, under the hashed name: keep that one
+            self.delete(name)
+        return hashed
@@ -0,0 +1,152 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from app.models import Booking, ParkSlot, Payment, Rating, User
+from app.services import response_cache
+from app.services.analytics import rebuild_slot_stats
+from app.services.geo import encode_geohash
+from app.services.ratings import rebuild_rating_aggregates
+from app.utils import get_char_uuid
+
+PASSWORD = 'synthetic-pass'
+
+STREETS = ['Durbar Marg', 'Thamel Marg', 'Lazimpat', 'Baneshwor', 'Kupondole', 'Jhamsikhel', 'Maharajgunj',
+           'Putalisadak', 'Tripureshwor', 'Koteshwor', 'Chabahil', 'Boudha', 'Balaju', 'Kalanki', 'Sanepa']
+AREAS = ['Kathmandu', 'Lalitpur', 'Bhaktapur', 'Kirtipur']
+DESCRIPTIONS = ['Covered parking', 'Open lot', 'Basement parking', 'Gated compound', 'Roadside bay',
+                'CCTV monitored', 'Near the bus stop', 'Guarded at night', 'EV charging available']
+
+# Kathmandu valley
+LAT_RANGE = (27.62, 27.78)
+LNG_RANGE = (85.24, 85.44)
+
+
+def generate_users(count, rnd, tag, batch_size):
+    """
+    Create users sharing one password hash; every twentieth one is a slot provider.
+    """
+    password = make_password(PASSWORD)
+    users = [
+        User(username=f'synthetic-{tag}-{i}', email=f'synthetic-{tag}-{i}@example.com', password=password,
+             role_type='provider' if i % 20 == 0 else 'user')
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=batch_size)
+    return list(User.objects.filter(username__startswith=f'synthetic-{tag}-').values_list('id', 'role_type'))
+
+
+def build_slot(owner_id, rnd):
+    lat, lng = rnd.uniform(*LAT_RANGE), rnd.uniform(*LNG_RANGE)
+    return ParkSlot(
+        owner_id=owner_id,
+        price=rnd.choice([20, 30, 50, 75, 100, 150, 200]),
+        address=f'{rnd.choice(STREETS)} {rnd.randint(1, 400)}, {rnd.choice(AREAS)}',
+        coordinates=f'{lat:.6f},{lng:.6f}',
+        latitude=lat,
+        longitude=lng,
+        geohash=encode_geohash(lat, lng),
+        description=', '.join(rnd.sample(DESCRIPTIONS, 2)),
+        type=rnd.choice(['Bike', 'Car', 'Car', 'Car', 'Van', 'Bus', 'Truck']),
+    )
+
+
+def build_bookings(slot, customers, count, rnd, now, days_back):
+    """
+    Non-overlapping bookings for one slot, from days_back days ago onwards.
+    Past ones are mostly paid, a few were abandoned at checkout; future ones are a mix.
+    Yields (booking, payment status).
+    """
+    cursor = now - timedelta(days=days_back)
+    for _ in range(count):
+        start_time = cursor + timedelta(minutes=rnd.randrange(0, 12 * 60, 30))
+        duration = rnd.choice([60, 60, 120, 120, 180, 240, 480])
+        end_time = start_time + timedelta(minutes=duration)
+        cursor = end_time
+
+        roll = rnd.random()
+        if end_time <= now:
+            payment_status = 'Success' if roll < 0.9 else 'Failed'
+        else:
+            payment_status = 'Success' if roll < 0.7 else 'Pending'
+
+        paid = payment_status == 'Success'
+        yield Booking(
+            slot_id=slot.id, user_id=rnd.choice(customers), start_time=start_time, end_time=end_time,
+            duration=duration, total_price=max(round(duration / 60 * slot.price, 2), 10),
+            booked=paid, is_paid=paid,
+        ), payment_status
+
+
+def generate_slot_batch(slots, customers, rnd, now, bookings_per_slot, rating_ratio, days_back, batch_size):
+    """
+    Bookings, payments and ratings for a batch of already saved slots, then their aggregates and rollups.
+    Returns (bookings, payments, ratings) created.
+    """
+    bookings, statuses = [], []
+    for slot in slots:
+        for booking, payment_status in build_bookings(slot, customers, bookings_per_slot, rnd, now, days_back):
+            bookings.append(booking)
+            statuses.append(payment_status)
+    Booking.objects.bulk_create(bookings, batch_size=batch_size)
+
+    payments, ratings, rated = [], [], set()
+    for booking, payment_status in zip(bookings, statuses):
+        payments.append(Payment(
+            user_id=booking.user_id, booking_id=booking.id, amount=booking.total_price, status=payment_status,
+            gateway_status={'Success': 'Completed', 'Failed': 'Expired', 'Pending': 'Initiated'}[payment_status],
+            pidx=get_char_uuid(22), payment_url='https://pay.example.com/',
+            transaction_id=get_char_uuid(22) if booking.is_paid else None,
+        ))
+        if booking.is_paid and booking.end_time <= now and (booking.slot_id, booking.user_id) not in rated:
+            if rnd.random() < rating_ratio:
+                rated.add((booking.slot_id, booking.user_id))
+                ratings.append(Rating(
+                    slot_id=booking.slot_id, user_id=booking.user_id, rating=rnd.choices(
+                        [1, 2, 3, 4, 5], weights=[1, 1, 3, 6, 5])[0]))
+    Payment.objects.bulk_create(payments, batch_size=batch_size)
+    Rating.objects.bulk_create(ratings, batch_size=batch_size)
+
+    slot_ids = [slot.id for slot in slots]
+    rebuild_rating_aggregates(ParkSlot.objects.filter(id__in=slot_ids))
+    rebuild_slot_stats(slot_ids)
+    return len(bookings), len(payments), len(ratings)
+
+
+def generate(users, slots, bookings_per_slot, rating_ratio=0.3, days_back=90, seed=None, batch_size=2000,
+             progress=None):
+    """
+    Bulk-generate a synthetic data set and return the row counts created.
+    Slots are written in batches, each committed with its bookings, payments, ratings, rating aggregates
+    and daily rollups, so memory stays flat however large the data set is.
+    """
+    rnd = random.Random(seed)
+    tag = get_char_uuid(6)
+    now = timezone.now()
+    created = {'users': users, 'slots': 0, 'bookings': 0, 'payments': 0, 'ratings': 0}
+
+    with transaction.atomic():
+        people = generate_users(users, rnd, tag, batch_size)
+    owners = [user_id for user_id, role in people if role == 'provider']
+    customers = [user_id for user_id, role in people if role == 'user'] or owners
+
+    # keeps each batch at roughly batch_size bookings
+    slots_per_batch = max(1, batch_size // max(bookings_per_slot, 1))
+    for start in range(0, slots, slots_per_batch):
+        with transaction.atomic():
+            batch = [build_slot(rnd.choice(owners), rnd) for _ in range(min(slots_per_batch, slots - start))]
+            ParkSlot.objects.bulk_create(batch)
+            counts = generate_slot_batch(
+                batch, customers, rnd, now, bookings_per_slot, rating_ratio, days_back, batch_size)
+
+        created['slots'] += len(batch)
+        for key, value in zip(('bookings', 'payments', 'ratings'), counts):
+            created[key] += value
+        if progress:
+            progress(created)
+
+    response_cache.invalidate()
+    return created
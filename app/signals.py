@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from app.models import Booking, ParkSlot, Rating, User
+from app.services import response_cache
+from app.services.authentication import user_cache
+from app.services.search import restore_sqlite_triggers
+from app.services.ratings import apply_rating_delta
+
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_rating(sender, instance, **kwargs):
+    """
+    Keep the stored rating so post_save can apply only the difference.
+    """
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Rating.objects.filter(pk=instance.pk).values_list('slot_id', 'rating').first()
+
+
+@receiver(post_save, sender=Rating)
+def update_rating_aggregates(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        apply_rating_delta(instance.slot_id, 1, instance.rating)
+        return
+
+    previous_slot_id, previous_rating = previous
+    if previous_slot_id != instance.slot_id:
+        apply_rating_delta(previous_slot_id, -1, -previous_rating)
+        apply_rating_delta(instance.slot_id, 1, instance.rating)
+    elif previous_rating != instance.rating:
+        apply_rating_delta(instance.slot_id, 0, instance.rating - previous_rating)
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, origin=None, **kwargs):
+    # nothing to maintain when the slot itself is being deleted
+    if isinstance(origin, ParkSlot):
+        return
+    apply_rating_delta(instance.slot_id, -1, -instance.rating)
+
+
+@receiver(post_save, sender=ParkSlot)
+@receiver(post_delete, sender=ParkSlot)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Booking)
+def invalidate_park_slot_responses(sender, origin=None, **kwargs):
+    # cascades from a slot delete are covered by the slot's own signal
+    if sender is not ParkSlot and isinstance(origin, ParkSlot):
+        return
+    transaction.on_commit(response_cache.invalidate)
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_on_booking(sender, instance, **kwargs):
+    # open checkouts hold their window too, so slot details show every active booking
+    transaction.on_commit(response_cache.invalidate)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # profile updates, password changes and deactivation take effect on the next request
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using='default', **kwargs):
+    if sender.name == 'app':
+        restore_sqlite_triggers(using)
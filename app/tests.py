@@ -1,3 +1,1492 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import msgpack
+from PIL import Image
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app import schedular, views
+from app.models import Booking, ParkSlot, Payment, Rating, SlotDailyStats, User
+from app.serializers import ParkSlotSerializer, slot_list_data, slot_list_fields, slot_list_values
+from app.payment import apply_payment_status, save_payment_status
+from app.management.commands.run_payment_worker import LEASE_NAME
+from app.schedular import expire_checkouts, next_check_delay
+from app.services import response_cache
+from app.services.authentication import user_cache
+from app.services.availability import double_booked, overlapping, reserve, reserve_many
+from app.services.geo import covering_cells, encode_geohash, haversine_km
+from app.services.images import render_variants
+from app.services.lease import Lease
+from app.services.pricing import quote, quote_many
+from app.services.renderers import ORJSONRenderer
+from app.services.recurrence import expand
+from app.services.search import has_search_index
+
+PASSWORD = 'Secret-pass-123'
+SMALL, LARGE = 3, 30
+
+
+def picture(name='picture.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+def fake_payment_status(pidx):
+    return 'Success', 'Completed', f'txn-{pidx}'
+
+
+async def afake_payment_link(amount, booking_id, order_id, return_url):
+    return {'pidx': f'pidx-{order_id}', 'payment_url': 'https://pay.example.com/'}
+
+
+async def afake_payment_status(pidx):
+    return fake_payment_status(pidx)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every route must run a fixed number of queries that does not grow with the data behind it.
+    Each endpoint is measured after seeding SMALL and again after LARGE more rows per table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = cls.make_user('owner', is_staff=True, is_superuser=True)
+        cls.customer = cls.make_user('customer')
+        cls.slot = ParkSlot.objects.create(
+            price=50, owner=cls.owner, address='Thamel Marg, Kathmandu', coordinates='27.7154,85.3123',
+            description='Covered parking', type='Car')
+
+    @classmethod
+    def make_user(cls, name, **kwargs):
+        user = User(username=name, email=f'{name}@example.com', **kwargs)
+        user.set_password(PASSWORD)
+        user.save()
+        return user
+
+    def setUp(self):
+        self.hours = count()
+        self.seq = count()
+        # probed once per process, not per request
+        has_search_index()
+
+    def grow(self, n):
+        """
+        Add n slots, n bookings (half expired) with payments, and n ratings of the measured slot.
+        """
+        now = timezone.now()
+        for _ in range(n):
+            i = next(self.seq)
+            rater = User.objects.create(username=f'rater{self.id()}{i}', email=f'rater{i}@example.com')
+            ParkSlot.objects.create(
+                price=30, owner=self.owner, address=f'Street {i}', coordinates=f'27.7{i % 10},85.3{i % 10}',
+                description='Open lot', type='Bike')
+            Rating.objects.create(slot=self.slot, user=rater, rating=i % 5 + 1)
+
+            offset = next(self.hours) * 2 - n
+            booking = Booking.objects.create(
+                slot=self.slot, user=self.customer, start_time=now + timedelta(hours=offset),
+                end_time=now + timedelta(hours=offset + 1), total_price=50, duration=60, booked=True, is_paid=True)
+            Payment.objects.create(
+                user=self.customer, amount=50, booking=booking, pidx=f'paid-{self.id()}-{i}',
+                payment_url='https://pay.example.com/', status='Success')
+
+            pending = Booking.objects.create(
+                slot=self.slot, user=self.customer, start_time=now + timedelta(days=30, hours=i),
+                end_time=now + timedelta(days=30, hours=i + 1), total_price=50, duration=60)
+            Payment.objects.create(
+                user=self.customer, amount=50, booking=pending, pidx=f'pending-{self.id()}-{i}',
+                payment_url='https://pay.example.com/')
+
+    def client_for(self, user):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def measure(self, call):
+        cache.clear()
+        user_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = call()
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        return response, len(queries)
+
+    def assertBudget(self, call, budget, expected_status=200, prepare=None):
+        """
+        call performs one request and must stay within budget at both scales.
+        It gets the scale, or whatever prepare(scale) returns; prepare runs unmeasured.
+        """
+        counts = []
+        for scale in (SMALL, LARGE):
+            self.grow(scale)
+            arg = prepare(scale) if prepare else scale
+            response, queries = self.measure(lambda: call(arg))
+            self.assertEqual(response.status_code, expected_status, getattr(response, 'data', response))
+            counts.append(queries)
+
+        self.assertEqual(counts[0], counts[1], f'query count grows with data: {counts}')
+        self.assertLessEqual(counts[1], budget, f'{counts[1]} queries over budget of {budget}')
+
+    # auth
+
+    def test_get_token(self):
+        client = self.client_for(None)
+        self.assertBudget(lambda n: client.post('/get-token/', {'username': 'customer', 'password': PASSWORD}), 3)
+
+    def test_refresh_and_verify_token(self):
+        client = self.client_for(None)
+        refresh = RefreshToken.for_user(self.customer)
+        self.assertBudget(lambda n: client.post('/refresh-token/', {'refresh': str(refresh)}), 0)
+        self.assertBudget(lambda n: client.post('/verify-token/', {'token': str(refresh.access_token)}), 0)
+
+    def test_admin_index(self):
+        client = APIClient()
+        client.force_login(self.owner)
+        self.assertBudget(lambda n: client.get('/admin/'), 6)
+
+    # users
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_register(self):
+        client = self.client_for(None)
+        self.assertBudget(lambda n: client.post(
+            '/api/register/', {'email': f'new{n}@example.com', 'password': PASSWORD, 'role_type': 'user',
+                               'profilePic': picture()}), 5)
+
+    def test_user_details(self):
+        client = self.client_for(self.customer)
+        self.assertBudget(lambda n: client.get('/api/user/'), 1)
+        self.assertBudget(lambda n: client.put('/api/user/update/', {'role_type': 'user'}), 3)
+
+    # owner slots
+
+    def test_owner_slots(self):
+        client = self.client_for(self.owner)
+        self.assertBudget(lambda n: client.get('/api/parkslot/'), 3)
+        self.assertBudget(lambda n: client.get(f'/api/parkslot/{self.slot.id}/'), 4)
+        self.assertBudget(lambda n: client.patch(f'/api/parkslot/{self.slot.id}/', {'price': 60}), 3)
+        self.assertBudget(lambda n: client.post('/api/parkslot/', {
+            'price': 20, 'address': 'Lakeside', 'description': 'Open lot', 'type': 'Car'}), 2, 201)
+
+    def test_owner_slot_delete(self):
+        client = self.client_for(self.owner)
+        self.assertBudget(lambda slot: client.delete(f'/api/parkslot/{slot.id}/'), 16, 204, prepare=self.grow_slot)
+
+    def grow_slot(self, n):
+        slot = ParkSlot.objects.create(price=10, owner=self.owner, address='Gone', description='x', type='Car')
+        now = timezone.now()
+        for i in range(n):
+            booking = Booking.objects.create(
+                slot=slot, user=self.customer, start_time=now + timedelta(hours=i),
+                end_time=now + timedelta(hours=i + 1), total_price=10, duration=60, booked=True)
+            Payment.objects.create(user=self.customer, amount=10, booking=booking, pidx=f'gone-{n}-{i}',
+                                   payment_url='https://pay.example.com/')
+            Rating.objects.create(
+                slot=slot, user=User.objects.create(username=f'gone{n}-{i}', email=f'gone{n}-{i}@example.com'),
+                rating=3)
+        return slot
+
+    def test_owner_ledger(self):
+        client = self.client_for(self.owner)
+        self.assertBudget(lambda n: client.get(f'/api/parkslot/bookings/{self.slot.id}/'), 4)
+        self.assertBudget(lambda n: client.get(f'/api/parkslot/bookings/{self.slot.id}/export/'), 3)
+        self.assertBudget(lambda n: client.get(
+            f'/api/parkslot/bookings/{self.slot.id}/export/', {'export_format': 'ndjson'}), 3)
+        self.assertBudget(lambda n: client.get(f'/api/parkslot/analytics/{self.slot.id}/', {'period': 'week'}), 3)
+
+    # public slots
+
+    def test_public_slots(self):
+        client = self.client_for(self.customer)
+        self.assertBudget(lambda n: client.get('/api/parkslots/'), 4)
+        self.assertBudget(lambda n: client.get('/api/parkslots/', {'search': 'thamel', 'type': 'Car'}), 4)
+        self.assertBudget(lambda n: client.get('/api/parkslots/', {'fields': 'id,coordinates,price,type,status'}), 4)
+        self.assertBudget(lambda n: client.get(f'/api/parkslots/{self.slot.id}/'), 4)
+        self.assertBudget(lambda n: client.get('/api/parkslots/nearby/', {'lat': 27.72, 'lng': 85.31}), 2)
+
+    def test_availability(self):
+        client = self.client_for(self.customer)
+        window = {'start_time': '2031-01-01T10:00:00', 'end_time': '2031-01-01T12:00:00'}
+        self.assertBudget(
+            lambda slot_ids: client.get('/api/availability/', {'slot_ids': slot_ids, **window}), 2,
+            prepare=lambda n: ','.join(str(i) for i in ParkSlot.objects.values_list('id', flat=True)[:50]))
+        self.assertBudget(lambda n: client.get(f'/api/availability/{self.slot.id}/', window), 3)
+
+    def test_quotes(self):
+        client = self.client_for(self.customer)
+        window = {'start_time': '2031-01-01T10:00:00', 'end_time': '2031-01-02T12:00:00'}
+        self.assertBudget(
+            lambda slot_ids: client.get('/api/quote/', {'slot_ids': slot_ids, **window}), 2,
+            prepare=lambda n: ','.join(str(i) for i in ParkSlot.objects.values_list('id', flat=True)[:50]))
+        self.assertBudget(lambda n: client.get('/api/parkslots/', {'fields': 'id,coordinates', **window}), 4)
+
+    # bookings and payments
+
+    @mock.patch.object(views, 'acreate_payment_link', afake_payment_link)
+    def test_book(self):
+        client = self.client_for(self.customer)
+        self.assertBudget(lambda n: client.post('/api/book/', {
+            'park_slot_id': self.slot.id, 'start_time': f'2032-01-{n:02d}T10:00:00',
+            'end_time': f'2032-01-{n:02d}T12:00:00'}, format='json'), 9)
+
+    @mock.patch.object(views, 'acreate_payment_link', afake_payment_link)
+    def test_bulk_book(self):
+        client = self.client_for(self.customer)
+        self.assertBudget(lambda n: client.post('/api/book/bulk/', {
+            'park_slot_id': self.slot.id, 'start_time': f'{2030 + n}-01-01T10:00:00',
+            'end_time': f'{2030 + n}-01-01T12:00:00', 'recurrence': {'frequency': 'daily', 'count': n}}, format='json'), 12)
+
+    @mock.patch.object(views, 'acheck_payment_status', afake_payment_status)
+    def test_verify_payment(self):
+        client = self.client_for(None)
+        self.assertBudget(
+            lambda pidx: client.get('/api/payment/verify/', {'pidx': pidx}), 13,
+            prepare=lambda n: Payment.objects.filter(status='Pending').latest('id').pidx)
+
+    def test_user_bookings(self):
+        client = self.client_for(self.customer)
+        self.assertBudget(lambda n: client.get('/api/bookings/'), 4)
+        self.assertBudget(lambda n: client.get('/api/bookings/', {'status': 'Booked'}), 4)
+
+    def test_rate(self):
+        def new_booking(n):
+            user = User.objects.create(username=f'new-rater{n}', email=f'new-rater{n}@example.com')
+            booking = Booking.objects.create(
+                slot=self.slot, user=user, start_time=timezone.now() - timedelta(days=n, hours=2),
+                end_time=timezone.now() - timedelta(days=n), total_price=10, duration=120, booked=True)
+            return self.client_for(user), booking
+
+        self.assertBudget(
+            lambda arg: arg[0].post('/api/rate/', {'booking_id': arg[1].id, 'rating': 4}, format='json'), 6,
+            prepare=new_booking)
+
+    def test_cache_stats(self):
+        client = self.client_for(self.owner)
+        self.assertBudget(lambda n: client.get('/api/cache/stats/'), 1)
+
+    # background jobs
+
+    @mock.patch.object(schedular, 'check_payment_status', fake_payment_status)
+    def test_update_payment_status(self):
+        class Done:
+            status_code = 200
+
+        def run(n):
+            schedular.update_payment_status()
+            return Done
+
+        self.assertBudget(run, 17)
+        self.assertFalse(Payment.objects.filter(status='Pending').exists())
+
+
+class QueryPlanTests(TestCase):
+    """
+    Hot-path queries must be answered from an index, never by scanning the whole table.
+    """
+
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            if ' SCAN ' in f' {line} ' and 'USING' not in line:
+                self.fail(f'full table scan:\n{plan}')
+
+    def test_booking_conflict(self):
+        now = timezone.now()
+        self.assertNoFullScan(overlapping(now, now + timedelta(hours=2)).filter(slot_id=1))
+
+    def test_pending_payments(self):
+        self.assertNoFullScan(Payment.objects.filter(
+            status='Pending', next_check_at__lte=timezone.now()).order_by('next_check_at')[:100])
+        self.assertNoFullScan(Payment.objects.filter(
+            status='Pending', created_at__lte=timezone.now()).order_by('created_at', 'id')[:100])
+        self.assertNoFullScan(Booking.objects.filter(booked=False, is_active=True, created_at__lte=timezone.now()))
+
+    def test_slot_listing(self):
+        self.assertNoFullScan(ParkSlot.objects.order_by('-created_at')[:50])
+        self.assertNoFullScan(ParkSlot.objects.filter(owner_id=1).order_by('-created_at')[:50])
+
+    def test_booking_feeds(self):
+        self.assertNoFullScan(Booking.objects.filter(user_id=1, booked=True).order_by('-start_time', '-id')[:50])
+        self.assertNoFullScan(Booking.objects.filter(slot_id=1, booked=True).order_by('-start_time', '-id')[:50])
+
+
+class PictureVariantTests(TestCase):
+
+    def test_render_variants(self):
+        directory = tempfile.mkdtemp()
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees
+        exif[0x010F] = 'PhoneCam'
+        Image.new('RGB', (2000, 1000)).save(os.path.join(directory, 'photo.jpg'), 'JPEG', exif=exif.tobytes())
+
+        variants = render_variants(os.path.join(directory, 'photo.jpg'), {'thumbnail': 160, 'card': 480}, 80)
+        self.assertEqual(set(variants), {'thumbnail', 'card'})
+        sizes = {}
+        for name, relative in variants.items():
+            with Image.open(os.path.join(directory, relative)) as image:
+                self.assertFalse(image.getexif())
+                sizes[name] = image.size
+        self.assertEqual(sizes, {'thumbnail': (80, 160), 'card': (240, 480)})
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_upload_queues_processing_and_serves_variant_urls(self):
+        owner = User.objects.create(username='owner', email='owner@example.com')
+        client = APIClient()
+        client.force_authenticate(owner)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.post('/api/parkslot/', {
+                'price': 20, 'address': 'Lakeside', 'description': 'Open lot', 'type': 'Car', 'picture': picture()})
+        self.assertEqual(response.status_code, 201)
+        # rendering the variants, and dropping the cached slot responses
+        self.assertEqual(len(callbacks), 2)
+
+        slot = ParkSlot.objects.get()
+        slot.picture_variants = {'thumbnail': 'mediafiles/parkPic/variants/picture-thumbnail.webp'}
+        slot.save()
+        self.assertEqual(client.get(f'/api/parkslot/{slot.id}/').data['picture_variants'], {
+            'thumbnail': 'http://testserver/media/mediafiles/parkPic/variants/picture-thumbnail.webp'})
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MediaTests(TestCase):
+
+    def setUp(self):
+        self.name = default_storage.save('mediafiles/parkPic/photo.png', ContentFile(b'0123456789'))
+
+    def test_uploads_are_content_addressed(self):
+        digest = hashlib.sha256(b'0123456789').hexdigest()
+        self.assertEqual(self.name, f'mediafiles/parkPic/{digest[:2]}/{digest}.png')
+        self.assertEqual(default_storage.save('mediafiles/parkPic/copy.png', ContentFile(b'0123456789')), self.name)
+
+    def test_concurrent_identical_uploads_are_stored_once(self):
+        exists = default_storage.exists
+        checked = []
+
+        def racing_exists(name):
+            # the other upload writes the file right after this one checked for it
+            if name == self.name and not checked:
+                checked.append(name)
+                return False
+            return exists(name)
+
+        with mock.patch.object(default_storage, 'exists', racing_exists):
+            self.assertEqual(default_storage.save('mediafiles/parkPic/copy.png', ContentFile(b'0123456789')), self.name)
+        self.assertEqual(os.listdir(os.path.dirname(default_storage.path(self.name))), [os.path.basename(self.name)])
+
+    def test_serve(self):
+        response = self.client.get(f'/media/{self.name}')
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        self.assertEqual(self.client.get(f'/media/{self.name}', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+    def test_range(self):
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=2-5')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 2-5/10'))
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        self.assertEqual(self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=10-').status_code, 416)
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel')
+    def test_front_server_sends_the_bytes(self):
+        response = self.client.get(f'/media/{self.name}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel', MEDIA_ROOT=tempfile.mkdtemp())
+    def test_front_server_gets_an_encoded_uri(self):
+        # uploaded before names were content addressed
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'mediafiles/parkPic'))
+        with open(os.path.join(settings.MEDIA_ROOT, 'mediafiles/parkPic/Café 100%.png'), 'wb') as legacy:
+            legacy.write(b'0123456789')
+        response = self.client.get('/media/mediafiles/parkPic/Caf%C3%A9%20100%25.png')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/mediafiles/parkPic/Caf%C3%A9%20100%25.png')
+
+        with override_settings(MEDIA_SERVE_MODE='x-sendfile'):
+            response = self.client.get('/media/mediafiles/parkPic/Caf%C3%A9%20100%25.png')
+        self.assertEqual(response['X-Sendfile'], f'{settings.MEDIA_ROOT}/mediafiles/parkPic/Caf%C3%A9%20100%25.png')
+
+
+class NearbyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner', email='owner@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def slot(self, lat, lng, **kwargs):
+        return ParkSlot.objects.create(
+            price=10, owner=self.owner, address='x', description='x', coordinates=f'{lat},{lng}', **{
+                'type': 'Car', **kwargs})
+
+    def nearby(self, lat, lng, **params):
+        response = self.client.get('/api/parkslots/nearby/', {'lat': lat, 'lng': lng, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(item['id'], item['distance_km']) for item in response.data['data']]
+
+    def test_sorted_by_distance_within_radius(self):
+        # Thamel, then 0.9, 1.6 and 2.6 km south of it
+        far, near, middle, centre = (self.slot(27.7154 - offset, 85.3123) for offset in (0.0234, 0.0081, 0.0144, 0))
+        self.slot(27.7154, 85.3123, type='Bike')
+
+        found = self.nearby(27.7154, 85.3123, radius=2, type='Car')
+        self.assertEqual([slot_id for slot_id, _ in found], [centre.id, near.id, middle.id])
+        self.assertEqual([distance for _, distance in found], sorted(distance for _, distance in found))
+        self.assertTrue(all(distance <= 2 for _, distance in found))
+
+        self.assertEqual([slot_id for slot_id, _ in self.nearby(27.7154, 85.3123, radius=2, limit=2, type='Car')],
+                         [centre.id, near.id])
+        self.assertIn(far.id, [slot_id for slot_id, _ in self.nearby(27.7154, 85.3123, radius=3)])
+
+    def test_rejects_non_finite_parameters(self):
+        self.slot(27.7154, 85.3123)
+        for params in ({'radius': 'nan'}, {'radius': 'inf'}, {'radius': '-inf'}, {'min_price': 'nan'},
+                       {'max_price': 'inf'}, {'lat': 'nan'}, {'lng': 'inf'}):
+            response = self.client.get('/api/parkslots/nearby/', {'lat': 27.7154, 'lng': 85.3123, **params})
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_across_the_antimeridian_and_the_pole(self):
+        east = self.slot(-16.5, 179.99)
+        self.assertEqual([slot_id for slot_id, _ in self.nearby(-16.5, -179.99, radius=5)], [east.id])
+
+        # 89.9N on opposite meridians are 22 km apart, over the pole
+        across = self.slot(89.9, -170)
+        self.assertEqual([slot_id for slot_id, _ in self.nearby(89.9, 10, radius=25)], [across.id])
+
+    def test_cells_cover_the_circle(self):
+        rnd = random.Random(1)
+        centres = [(27.7, 85.3), (0, 0), (-16.5, 179.99), (16.5, -179.99), (84, 30), (-89.8, 0), (60, 179.5)]
+        centres += [(rnd.uniform(-90, 90), rnd.uniform(-180, 180)) for _ in range(50)]
+        for lat, lng in centres:
+            for radius in (0.05, 0.5, 2, 20, 50):
+                cells = covering_cells(lat, lng, radius)
+                self.assertLessEqual(len(cells), 9)
+                for bearing in range(0, 360, 15):
+                    point = destination(lat, lng, bearing, radius * 0.999)
+                    self.assertLessEqual(haversine_km(lat, lng, *point), radius)
+                    geohash = encode_geohash(*point)
+                    self.assertTrue(any(geohash.startswith(cell) for cell in cells), (lat, lng, radius, point))
+
+        self.assertEqual(covering_cells(89.9, 0, 50), [''])
+
+
+def destination(lat, lng, bearing, km):
+    """
+    Point km away from (lat, lng) along bearing (degrees), on the sphere.
+    """
+    lat, lng, bearing, angle = math.radians(lat), math.radians(lng), math.radians(bearing), km / 6371.0088
+    lat2 = math.asin(math.sin(lat) * math.cos(angle) + math.cos(lat) * math.sin(angle) * math.cos(bearing))
+    lng2 = lng + math.atan2(math.sin(bearing) * math.sin(angle) * math.cos(lat),
+                            math.cos(angle) - math.sin(lat) * math.sin(lat2))
+    return math.degrees(lat2), (math.degrees(lng2) + 180) % 360 - 180
+
+
+class ResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner', email='owner@example.com')
+        cls.slot = ParkSlot.objects.create(price=10, owner=cls.owner, address='x', description='x', type='Car')
+
+    def setUp(self):
+        cache.clear()
+        response_cache.reset_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_hits_and_invalidation(self):
+        self.client.get('/api/parkslots/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/parkslots/')
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.data['results'][0]['price'], 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.price = 25
+            self.slot.save()
+        self.assertEqual(self.client.get('/api/parkslots/').data['results'][0]['price'], 25)
+
+        stats = response_cache.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        # the counters live in the process, a lookup writes nothing to the cache
+        self.assertIsNone(cache.get('parkslots:hits'))
+
+    def test_invalidates_after_commit(self):
+        version = response_cache.current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.price = 25
+            self.slot.save()
+            # a request before the commit must not cache the old row under the new version
+            self.assertEqual(response_cache.current_version(), version)
+        self.assertGreater(response_cache.current_version(), version)
+
+    def test_culled_version_never_goes_back(self):
+        self.client.get('/api/parkslots/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.price = 25
+            self.slot.save()
+        version = response_cache.current_version()
+        cache.delete(response_cache.VERSION_KEY)
+        self.assertGreater(response_cache.current_version(), version)
+        self.assertEqual(self.client.get('/api/parkslots/').data['results'][0]['price'], 25)
+
+    def test_payment_worker_warns_without_shared_cache(self):
+        self.assertFalse(response_cache.is_shared())
+        out = StringIO()
+        call_command('run_payment_worker', '--once', stdout=out)
+        self.assertIn('The cache is per process', out.getvalue())
+
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()}}):
+            self.assertTrue(response_cache.is_shared())
+            out = StringIO()
+            call_command('run_payment_worker', '--once', stdout=out)
+            self.assertNotIn('The cache is per process', out.getvalue())
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(username='owner', email='owner@example.com')
+        cls.described, cls.addressed, cls.other = (ParkSlot.objects.create(
+            price=10, owner=owner, address=address, description=description, type='Car') for address, description in (
+            ('Lakeside, Pokhara', 'Five minutes from Thamel'),
+            ('Thamel Marg, Kathmandu', 'Covered parking'),
+            ('Durbar Marg, Kathmandu', 'Open lot')))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get())
+
+    def ids(self, params):
+        response = self.client.get('/api/parkslots/', {'fields': 'id', **params})
+        return [row['id'] for row in response.data['results']]
+
+    def test_ranked_prefix_search(self):
+        self.assertTrue(has_search_index())
+        # address matches rank over description matches, the last word matches as a prefix
+        self.assertEqual(self.ids({'search': 'tham'}), [self.addressed.id, self.described.id])
+        self.assertCountEqual(self.ids({'search': 'marg kath'}), [self.addressed.id, self.other.id])
+        self.assertEqual(self.ids({'search': 'pokhara thamel'}), [self.described.id])
+        self.assertEqual(self.ids({'search': 'nowhere'}), [])
+
+        # the index follows edits of the slot
+        self.other.description = 'Next to Thamel chowk'
+        self.other.save()
+        self.assertIn(self.other.id, self.ids({'search': 'thamel'}))
+
+    def test_address_param_uses_the_index(self):
+        self.assertEqual(self.ids({'address': 'durbar'}), [self.other.id])
+        with CaptureQueriesContext(connection) as queries:
+            self.ids({'address': 'durb', 'page': 1})
+        sql = [query['sql'] for query in queries]
+        self.assertFalse([query for query in sql if 'LIKE' in query])
+        # the index is joined and matched once per query, not once per result row
+        self.assertTrue(all(query.count('MATCH') == 1 for query in sql if 'app_parkslot_fts' in query))
+
+
+class SlotListFieldsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(username='owner', email='owner@example.com')
+        for i in range(3):
+            ParkSlot.objects.create(
+                price=10 + i, owner=owner, address=f'Street {i}', coordinates='27.7,85.3', description='x' * 500,
+                type='Car', picture='mediafiles/parkPic/photo.png' if i else None,
+                picture_variants={'thumbnail': 'mediafiles/parkPic/variants/photo-160q80.webp'} if i else {})
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get())
+
+    def test_fast_path_matches_serializer(self):
+        request = APIRequestFactory().get('/api/parkslots/')
+        slots = ParkSlot.objects.order_by('id')
+        expected = ParkSlotSerializer(slots, many=True, context={'request': request}).data
+        fields = slot_list_fields(None)
+        self.assertEqual(slot_list_data(slot_list_values(slots, fields), fields, request), expected)
+
+    def test_sparse_fields(self):
+        response = self.client.get('/api/parkslots/', {'fields': 'price,id,coordinates'})
+        self.assertEqual(response.data['results'][0], {'id': 3, 'coordinates': '27.7,85.3', 'price': 12.0})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/parkslots/', {'fields': 'id,type', 'page': 1})
+        self.assertNotIn('description', queries[-1]['sql'])
+
+        response = self.client.get('/api/parkslots/', {'fields': 'id,owner'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner', email='owner@example.com')
+        cls.slot, cls.free = (
+            ParkSlot.objects.create(price=10, owner=cls.user, address='x', description='x', type='Car')
+            for _ in range(2))
+        day = datetime(2031, 1, 1, tzinfo=dt_timezone.utc)
+        # 09-11 paid, 10-12 open checkout (overlapping), 15-16 released checkout, 18-20 paid
+        for start, end, fields in ((9, 11, {'booked': True}), (10, 12, {}), (15, 16, {'is_active': False}),
+                                   (18, 20, {'booked': True})):
+            Booking.objects.create(
+                slot=cls.slot, user=cls.user, start_time=day + timedelta(hours=start),
+                end_time=day + timedelta(hours=end), total_price=10, duration=(end - start) * 60, **fields)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, path, start, end, **params):
+        return self.client.get(path, {
+            'start_time': f'2031-01-01T{start:02d}:00:00', 'end_time': f'2031-01-01T{end:02d}:00:00', **params})
+
+    def test_free_windows(self):
+        windows = self.get(f'/api/availability/{self.slot.id}/', 8, 22).data['data']
+        self.assertEqual([(item['start_time'].hour, item['end_time'].hour) for item in windows],
+                         [(8, 9), (12, 18), (20, 22)])
+        self.assertFalse(self.get(f'/api/availability/{self.slot.id}/', 9, 12).data['data'])
+        self.assertEqual(len(self.get(f'/api/availability/{self.free.id}/', 0, 23).data['data']), 1)
+
+        self.assertEqual(self.get('/api/availability/0/', 8, 22).status_code, 404)
+        self.assertEqual(self.get(f'/api/availability/{self.slot.id}/', 22, 8).status_code, 400)
+
+    def test_many_slots(self):
+        ids = f'{self.slot.id},{self.free.id},0'
+        data = self.get('/api/availability/', 11, 13, slot_ids=ids).data['data']
+        self.assertEqual((data['free'], data['booked']), ([self.free.id], [self.slot.id]))
+        data = self.get('/api/availability/', 15, 16, slot_ids=ids).data['data']
+        self.assertEqual((data['free'], data['booked']), ([self.slot.id, self.free.id], []))
+
+        too_many = ','.join(str(i) for i in range(101))
+        self.assertEqual(self.get('/api/availability/', 11, 13, slot_ids=too_many).status_code, 400)
+
+
+class RatingAggregateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner', email='owner@example.com')
+        cls.slot, cls.other = (
+            ParkSlot.objects.create(price=10, owner=cls.owner, address='x', description='x', type='Car')
+            for _ in range(2))
+        cls.raters = [User.objects.create(username=f'rater{i}', email=f'rater{i}@example.com') for i in range(3)]
+
+    def aggregates(self, slot):
+        return ParkSlot.objects.filter(pk=slot.pk).values_list('rating_count', 'rating_total', 'rating_avg').get()
+
+    def test_counters_follow_ratings(self):
+        ratings = [Rating.objects.create(slot=self.slot, user=user, rating=value)
+                   for user, value in zip(self.raters, (5, 4, 2))]
+        self.assertEqual(self.aggregates(self.slot), (3, 11, 11 / 3))
+
+        ratings[2].rating = 5
+        ratings[2].save()
+        self.assertEqual(self.aggregates(self.slot), (3, 14, 14 / 3))
+
+        ratings[1].slot = self.other
+        ratings[1].save()
+        self.assertEqual(self.aggregates(self.slot), (2, 10, 5))
+        self.assertEqual(self.aggregates(self.other), (1, 4, 4))
+
+        ratings[0].delete()
+        ratings[2].delete()
+        self.assertEqual(self.aggregates(self.slot), (0, 0, 0))
+
+    def test_backfill(self):
+        for user, value in zip(self.raters, (5, 4, 3)):
+            Rating.objects.create(slot=self.slot, user=user, rating=value)
+        ParkSlot.objects.update(rating_count=0, rating_total=0, rating_avg=0)
+
+        out = StringIO()
+        call_command('backfill_rating_aggregates', '--batch-size', '1', stdout=out)
+        self.assertIn('for 2 park slots', out.getvalue())
+        self.assertEqual(self.aggregates(self.slot), (3, 12, 4))
+        self.assertEqual(self.aggregates(self.other), (0, 0, 0))
+
+
+class AnalyticsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner', email='owner@example.com')
+        cls.slot = ParkSlot.objects.create(price=10, owner=cls.owner, address='x', description='x', type='Car')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def pay(self, start, hours, price=10):
+        booking = Booking.objects.create(
+            slot=self.slot, user=self.owner, start_time=start, end_time=start + timedelta(hours=hours),
+            total_price=price, duration=hours * 60)
+        payment = Payment.objects.create(
+            user=self.owner, amount=price, booking=booking, pidx=f'p{booking.id}',
+            payment_url='https://pay.example.com/')
+        apply_payment_status(payment, *fake_payment_status(payment.pidx))
+        save_payment_status([payment])
+
+    def rollups(self):
+        return list(SlotDailyStats.objects.order_by('date').values_list(
+            'date', 'bookings', 'booked_duration', 'booked_minutes', 'revenue'))
+
+    def analytics(self, **params):
+        return self.client.get(f'/api/parkslot/analytics/{self.slot.id}/', params)
+
+    def test_paid_bookings_maintain_rollups(self):
+        # 22:00 to 02:00 occupies two days, counted once on the first
+        self.pay(datetime(2030, 1, 7, 22, tzinfo=dt_timezone.utc), 4, price=40)
+        self.pay(datetime(2030, 1, 8, 9, tzinfo=dt_timezone.utc), 2, price=20)
+        # unpaid checkouts are not counted
+        Booking.objects.create(
+            slot=self.slot, user=self.owner, start_time=datetime(2030, 1, 8, 12, tzinfo=dt_timezone.utc),
+            end_time=datetime(2030, 1, 8, 13, tzinfo=dt_timezone.utc), total_price=10, duration=60)
+
+        expected = [(datetime(2030, 1, 7).date(), 1, 240, 120, 40), (datetime(2030, 1, 8).date(), 1, 120, 240, 20)]
+        self.assertEqual(self.rollups(), expected)
+
+        SlotDailyStats.objects.update(bookings=99)
+        out = StringIO()
+        call_command('rebuild_slot_stats', stdout=out)
+        self.assertIn('Wrote 2 daily stats rows', out.getvalue())
+        self.assertEqual(self.rollups(), expected)
+
+    def test_endpoint(self):
+        self.pay(datetime(2030, 1, 7, 22, tzinfo=dt_timezone.utc), 4, price=40)
+        self.pay(datetime(2030, 1, 8, 9, tzinfo=dt_timezone.utc), 2, price=20)
+
+        days = self.analytics(from_date='2030-01-07', to_date='2030-01-08').data['data']
+        self.assertEqual([(day['bookings'], day['booked_minutes'], day['revenue']) for day in days],
+                         [(1, 120, 40), (1, 240, 20)])
+        self.assertEqual(days[1]['occupancy_rate'], round(240 / 1440, 4))
+        self.assertEqual(days[0]['average_duration_minutes'], 240)
+
+        # Tuesday to Thursday: the week starting Monday 2030-01-07 is clipped to 3 days
+        week, = self.analytics(period='week', from_date='2030-01-08', to_date='2030-01-10').data['data']
+        self.assertEqual(week['booked_minutes'], 240)
+        self.assertEqual(week['occupancy_rate'], round(240 / (3 * 1440), 4))
+
+    def test_invalid_requests(self):
+        for params in ({'from_date': 'yesterday'}, {'to_date': '2030-1-x'}, {'to_date': '2030-02-30'},
+                       {'period': 'month'}, {'from_date': '2030-01-10', 'to_date': '2030-01-01'},
+                       {'from_date': '2029-01-01', 'to_date': '2030-01-02'}):
+            self.assertEqual(self.analytics(**params).status_code, 400, params)
+
+        self.client.force_authenticate(User.objects.create(username='other', email='other@example.com'))
+        self.assertEqual(self.analytics().status_code, 403)
+
+
+class PricingTests(TestCase):
+    start = datetime(2030, 1, 7, 9, 0, tzinfo=dt_timezone.utc)
+
+    def window(self, hours):
+        return self.start, self.start + timedelta(hours=hours)
+
+    def test_flat_price(self):
+        self.assertEqual(quote(40, {}, *self.window(2.5)), 100)
+        # the minimum charge still applies
+        self.assertEqual(quote(4, {}, *self.window(1)), 10)
+
+    def test_tiers_bands_and_daily_max(self):
+        tiers = {'tiers': [{'after_hours': 2, 'multiplier': 0.5}]}
+        self.assertEqual(quote(40, tiers, *self.window(4)), 2 * 40 + 2 * 20)
+
+        # 22:00-06:00 at half price, wrapping midnight: 20:00-24:00 is 2h full + 2h night
+        night = {'bands': [{'start': '22:00', 'end': '06:00', 'multiplier': 0.5}]}
+        start = self.start.replace(hour=20)
+        self.assertEqual(quote(40, night, start, start + timedelta(hours=12)), 2 * 40 + 8 * 20 + 2 * 40)
+
+        # three calendar days, the middle one capped
+        capped = {'daily_max': 300}
+        start = self.start.replace(hour=20)
+        self.assertEqual(quote(40, capped, start, start + timedelta(hours=28)), 4 * 40 + 300)
+
+    def test_quote_many_matches_quote(self):
+        table = {'tiers': [{'after_hours': 3, 'multiplier': 0.8}],
+                 'bands': [{'start': '07:00', 'end': '10:00', 'multiplier': 1.5}], 'daily_max': 250}
+        start, end = self.window(30)
+        slots = [(1, 40, table), (2, 15, table), (3, 40, {}), (4, 25, None)]
+        self.assertEqual(quote_many(slots, start, end),
+                         {slot_id: quote(price, table, start, end) for slot_id, price, table in slots})
+
+    def test_rate_table_validation(self):
+        owner = User.objects.create(username='owner', email='owner@example.com', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(owner)
+        slot = {'price': 20, 'address': 'Lakeside', 'description': 'Open lot', 'type': 'Car'}
+        for table in ({'surge': 2}, {'tiers': [{'after_hours': 2}]},
+                      {'bands': [{'start': '25:00', 'end': '06:00', 'multiplier': 1}]}, {'daily_max': 0},
+                      {'tiers': [{'after_hours': 0, 'multiplier': 'nan'}]},
+                      {'bands': [{'start': '07:00', 'end': '10:00', 'multiplier': '2'}]},
+                      {'bands': [{'start': '07:00', 'end': '10:00', 'multiplier': True}]}, {'daily_max': 'inf'}):
+            response = client.post('/api/parkslot/', {**slot, 'rate_table': table}, format='json')
+            self.assertEqual(response.status_code, 400, table)
+        # not valid JSON, but reachable from Python callers of the serializer
+        for table in ({'tiers': [{'after_hours': float('inf'), 'multiplier': 1}]}, {'daily_max': float('nan')}):
+            self.assertFalse(ParkSlotSerializer(data={**slot, 'rate_table': table}).is_valid(), table)
+
+        table = {'bands': [{'start': '07:00', 'end': '10:00', 'multiplier': 1.5}]}
+        response = client.post('/api/parkslot/', {**slot, 'rate_table': table}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        client.force_authenticate(User.objects.create(username='customer', email='customer@example.com'))
+        window = {'start_time': '2030-01-07T06:00:00', 'end_time': '2030-01-07T09:00:00'}
+        response = client.get('/api/quote/', {'slot_ids': f'{response.data["id"]},0', **window})
+        self.assertEqual(response.data['data']['quotes'], [{'slot_id': ParkSlot.objects.get().id, 'total_price': 80}])
+        response = client.get('/api/parkslots/', {'fields': 'type', **window})
+        self.assertEqual(response.data['results'], [{'type': 'Car', 'quoted_price': 80}])
+        response = client.get('/api/parkslots/', {'start_time': window['start_time']})
+        self.assertEqual(response.status_code, 400)
+
+
+class RendererTests(TestCase):
+
+    def test_orjson_output_matches_drf(self):
+        data = {
+            'slot': {'id': 1, 'price': 12.0, 'address': 'Thamel \u2028Marg', 'rating': None},
+            'start_time': datetime(2030, 1, 7, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'date': datetime(2030, 1, 7).date(),
+            'total': Decimal('10.50'),
+            'errors': [ErrorDetail('Invalid Password!', code='invalid')],
+            'counts': {1: 2},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_msgpack(self):
+        user = User.objects.create(username='driver', email='driver@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get('/api/user/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), client.get('/api/user/').json())
+
+
+class LoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User(username='driver', email='driver@example.com')
+        cls.user.set_password(PASSWORD)
+        cls.user.save()
+
+    def login(self, username, password=PASSWORD):
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=check_password) as hashed:
+            response = APIClient().post('/get-token/', {'username': username, 'password': password})
+        self.assertLessEqual(hashed.call_count, 1)
+        return response
+
+    def test_login_hashes_once(self):
+        for username in ('driver', 'driver@example.com'):
+            response = self.login(username)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(set(response.data['data']), {'access', 'refresh'})
+        self.assertEqual(self.login('driver', 'wrong').data['message'], ['Invalid Password!'])
+
+    def test_inactive_user_gets_no_token(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.login('driver').status_code, 401)
+
+
+class AuthenticationCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='driver', email='driver@example.com')
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def get_user(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/user/')
+        return response, len(queries)
+
+    def test_user_is_loaded_once(self):
+        _, cold = self.get_user()
+        response, warm = self.get_user()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(warm, cold - 1)
+        self.assertEqual(user_cache.stats()['db_lookups'], 1)
+        self.assertEqual(user_cache.stats()['hits'], 1)
+
+    def test_saved_user_is_reloaded(self):
+        self.get_user()
+        self.client.put('/api/user/update/', {'username': 'ram'})
+        self.assertEqual(self.get_user()[0].data['data']['username'], 'ram')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_user()[0].status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_TTL_SECONDS=0)
+    def test_disabled(self):
+        self.get_user()
+        self.assertEqual(self.get_user()[1], self.get_user()[1])
+        self.assertEqual(user_cache.stats()['hits'], 0)
+
+
+class PaymentStatusTests(TestCase):
+
+    def test_stale_result_does_not_overwrite_settled_payment(self):
+        owner = User.objects.create(username='owner', email='owner@example.com')
+        slot = ParkSlot.objects.create(price=10, owner=owner, address='x', description='x', type='Car')
+        booking = Booking.objects.create(
+            slot=slot, user=owner, start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1),
+            total_price=10, duration=60)
+        payment = Payment.objects.create(
+            user=owner, amount=10, booking=booking, pidx='p1', payment_url='https://pay.example.com/')
+        stale = Payment.objects.get(pk=payment.pk)
+
+        apply_payment_status(payment, *fake_payment_status('p1'))
+        self.assertEqual(save_payment_status([payment]), [payment.id])
+
+        apply_payment_status(stale, 'Pending', 'Initiated', None)
+        self.assertEqual(save_payment_status([stale]), [])
+        self.assertEqual(Payment.objects.get(pk=payment.pk).status, 'Success')
+        self.assertTrue(Booking.objects.get(pk=booking.pk).is_paid)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='user@example.com')
+        cls.slot = ParkSlot.objects.create(price=10, owner=cls.user, address='x', description='x', type='Car')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def book(self, **fields):
+        start = timezone.now() + timedelta(days=Booking.objects.count() + 1)
+        return Booking.objects.create(
+            slot=self.slot, user=self.user, start_time=start, end_time=start + timedelta(hours=1), total_price=10,
+            duration=60, **fields)
+
+    def assertRevalidates(self, path, change):
+        response = self.client.get(path)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        # another query is another representation
+        self.assertNotEqual(self.client.get(path, {'page_size': 1})['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_slot_list(self):
+        def edit():
+            self.slot.price = 20
+            self.slot.save()
+        response = self.assertRevalidates('/api/parkslots/', edit)
+        self.assertEqual(response.data['results'][0]['price'], 20)
+
+    def test_slot_detail(self):
+        response = self.assertRevalidates(f'/api/parkslots/{self.slot.id}/', self.book)
+        self.assertEqual(len(response.data['bookings']), 1)
+
+    def test_bookings_feed(self):
+        self.book(booked=True)
+        response = self.assertRevalidates('/api/bookings/', lambda: self.book(booked=True))
+        self.assertEqual(len(response.data['data']), 2)
+
+
+class BookingsFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='user@example.com')
+        other = User.objects.create(username='other', email='other@example.com')
+        cls.slot = ParkSlot.objects.create(
+            price=10, owner=other, address='Thamel', coordinates='27.7,85.3', description='x', type='Car')
+        now = timezone.now().replace(microsecond=0)
+        # three past and two upcoming paid bookings, newest first
+        cls.bookings = [Booking.objects.create(
+            slot=cls.slot, user=cls.user, start_time=now + timedelta(days=days),
+            end_time=now + timedelta(days=days, hours=1), total_price=10, duration=60, booked=True, is_paid=True)
+            for days in (20, 10, -10, -20, -30)]
+        Booking.objects.create(
+            slot=cls.slot, user=cls.user, start_time=now + timedelta(days=5), end_time=now + timedelta(days=5, hours=1),
+            total_price=10, duration=60)
+        Booking.objects.create(
+            slot=cls.slot, user=other, start_time=now, end_time=now + timedelta(hours=1), total_price=10, duration=60,
+            booked=True)
+        Rating.objects.create(slot=cls.slot, user=cls.user, rating=4)
+        cls.day = (now + timedelta(days=-10)).date()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_pages(self):
+        ids, pages = [], 0
+        response = self.client.get('/api/bookings/', {'page_size': 2})
+        while True:
+            pages += 1
+            ids += [item['id'] for item in response.data['data']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, [booking.id for booking in self.bookings])
+
+        first = self.client.get('/api/bookings/').data['data']
+        self.assertEqual(first[0]['parking_address'], 'Thamel')
+        self.assertEqual([(item['status'], item['rating']) for item in first],
+                         [('Booked', None)] * 2 + [('Expired', 4)] * 3)
+
+    def test_filters(self):
+        def ids(**params):
+            response = self.client.get('/api/bookings/', params)
+            self.assertEqual(response.status_code, 200, response.data)
+            return [item['id'] for item in response.data['data']]
+
+        self.assertEqual(ids(status='Booked'), [booking.id for booking in self.bookings[:2]])
+        self.assertEqual(ids(status='Expired'), [booking.id for booking in self.bookings[2:]])
+        self.assertEqual(ids(from_date=str(self.day), to_date=str(self.day)), [self.bookings[2].id])
+        self.assertEqual(ids(status='Expired', from_date=str(self.day - timedelta(days=10))),
+                         [booking.id for booking in self.bookings[2:4]])
+
+        for params in ({'status': 'Paid'}, {'from_date': '10-01-2030'}, {'to_date': '2030-02-30'}):
+            self.assertEqual(self.client.get('/api/bookings/', params).status_code, 400, params)
+
+
+class BookingExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='owner', email='owner@example.com')
+        rater, guest = (User.objects.create(username=name, email=f'{name}@example.com') for name in ('rater', 'guest'))
+        cls.slot = ParkSlot.objects.create(price=10, owner=cls.owner, address='x', description='x', type='Car')
+        cls.start = datetime(2030, 1, 7, 9, tzinfo=dt_timezone.utc)
+        cls.rated, cls.unrated = (Booking.objects.create(
+            slot=cls.slot, user=user, start_time=cls.start + timedelta(days=days),
+            end_time=cls.start + timedelta(days=days, hours=2), total_price=20, duration=120, booked=True,
+            is_paid=True) for user, days in ((rater, 0), (guest, 1)))
+        # unpaid checkouts are not in the ledger
+        Booking.objects.create(
+            slot=cls.slot, user=guest, start_time=cls.start, end_time=cls.start + timedelta(hours=1), total_price=10,
+            duration=60)
+        Rating.objects.create(slot=cls.slot, user=rater, rating=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def export(self, **params):
+        return self.client.get(f'/api/parkslot/bookings/{self.slot.id}/export/', params)
+
+    def test_csv(self):
+        response = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(int(response['Content-Length']), len(b''.join(response.streaming_content)))
+        response = self.export()
+        self.assertEqual(response['Content-Disposition'],
+                         f'attachment; filename="parkslot-{self.slot.id}-bookings.csv"')
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows, [
+            ['id', 'user_email', 'start_time', 'end_time', 'duration_minutes', 'total_price', 'booked', 'is_paid',
+             'status', 'rating'],
+            [str(self.unrated.id), 'guest@example.com', '2030-01-08T09:00:00+00:00', '2030-01-08T11:00:00+00:00',
+             '120.0', '20.0', 'True', 'True', 'Booked', ''],
+            [str(self.rated.id), 'rater@example.com', '2030-01-07T09:00:00+00:00', '2030-01-07T11:00:00+00:00',
+             '120.0', '20.0', 'True', 'True', 'Booked', '5'],
+        ])
+
+    def test_ndjson_and_filters(self):
+        response = self.export(export_format='ndjson', from_date='2030-01-07', to_date='2030-01-07')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{
+            'id': self.rated.id, 'user_email': 'rater@example.com', 'start_time': '2030-01-07T09:00:00Z',
+            'end_time': '2030-01-07T11:00:00Z', 'duration_minutes': 120, 'total_price': 20.0, 'booked': True,
+            'is_paid': True, 'status': 'Booked', 'rating': 5}])
+
+        self.assertEqual(self.export(export_format='xlsx').status_code, 400)
+        self.assertEqual(self.export(status='Paid').status_code, 400)
+        self.client.force_authenticate(User.objects.get(username='guest'))
+        self.assertEqual(self.export().status_code, 403)
+
+
+class AsgiExportTests(TransactionTestCase):
+    """
+    The export through the ASGI handler gunicorn serves, which iterates streaming responses on the event loop.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create(username='owner', email='owner@example.com')
+        self.slot = ParkSlot.objects.create(price=10, owner=self.owner, address='x', description='x', type='Car')
+        start = datetime(2030, 1, 7, 9, tzinfo=dt_timezone.utc)
+        Booking.objects.bulk_create([Booking(
+            slot=self.slot, user=self.owner, start_time=start + timedelta(hours=2 * i),
+            end_time=start + timedelta(hours=2 * i + 1), total_price=10, duration=60, booked=True, is_paid=True)
+            for i in range(30)])
+        self.token = str(RefreshToken.for_user(self.owner).access_token)
+
+    async def export(self, export_format):
+        communicator = ApplicationCommunicator(get_asgi_application(), {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': f'/api/parkslot/bookings/{self.slot.id}/export/', 'raw_path': b'',
+            'query_string': f'export_format={export_format}'.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {self.token}'.encode())],
+            'client': ('127.0.0.1', 1), 'server': ('testserver', 80)})
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(5)
+        body = b''
+        while True:
+            message = await communicator.receive_output(5)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        await communicator.wait()
+        return start['status'], body.decode()
+
+    async def test_csv_and_ndjson(self):
+        status_code, body = await self.export('csv')
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len(list(csv.reader(StringIO(body)))), 31)
+
+        status_code, body = await self.export('ndjson')
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len([json.loads(line) for line in body.splitlines()]), 30)
+
+
+@override_settings(PAYMENT_COMPLETE_REDIRECT_URL=None)
+class VerifyPaymentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(username='owner', email='owner@example.com')
+        slot = ParkSlot.objects.create(price=10, owner=owner, address='x', description='x', type='Car')
+        cls.booking = Booking.objects.create(
+            slot=slot, user=owner, start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1),
+            total_price=10, duration=60)
+        Payment.objects.create(
+            user=owner, amount=10, booking=cls.booking, pidx='p1', payment_url='https://pay.example.com/')
+
+    def verify(self, status, **params):
+        gateway = mock.AsyncMock(return_value=status)
+        with mock.patch.object(views, 'acheck_payment_status', gateway):
+            response = APIClient().get('/api/payment/verify/', params)
+        return response, gateway
+
+    def test_confirms_the_booking_once(self):
+        response, gateway = self.verify(('Pending', 'Initiated', None), pidx='p1')
+        self.assertEqual(response.data['data'], {'booking_id': self.booking.id, 'payment_status': 'Pending',
+                                                 'is_paid': False})
+        self.assertFalse(Booking.objects.get(pk=self.booking.pk).booked)
+
+        response, gateway = self.verify(fake_payment_status('p1'), pidx='p1')
+        self.assertEqual(response.data['data']['payment_status'], 'Success')
+        gateway.assert_awaited_once_with('p1')
+        booking = Booking.objects.get(pk=self.booking.pk)
+        self.assertTrue(booking.booked and booking.is_paid)
+        self.assertEqual(Payment.objects.get(pidx='p1').transaction_id, 'txn-p1')
+
+        # settled payments are answered without asking the gateway again
+        response, gateway = self.verify(('Failed', 'Expired', None), pidx='p1')
+        self.assertTrue(response.data['data']['is_paid'])
+        gateway.assert_not_awaited()
+
+    def test_redirect_and_errors(self):
+        with override_settings(PAYMENT_COMPLETE_REDIRECT_URL='https://app.example.com/paid'):
+            response, _ = self.verify(fake_payment_status('p1'), pidx='p1')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            response['Location'], f'https://app.example.com/paid?booking_id={self.booking.id}'
+                                  f'&payment_status=Success&is_paid=True')
+
+        self.assertEqual(self.verify(None, pidx='unknown')[0].status_code, 404)
+        self.assertEqual(self.verify(None)[0].status_code, 400)
+
+    def test_pidx_on_more_than_one_payment(self):
+        retried = Booking.objects.create(
+            slot=self.booking.slot, user=self.booking.user, start_time=self.booking.start_time,
+            end_time=self.booking.end_time, total_price=10, duration=60)
+        Payment.objects.create(
+            user=retried.user, amount=10, booking=retried, pidx='p1', payment_url='https://pay.example.com/')
+
+        response, _ = self.verify(fake_payment_status('p1'), pidx='p1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['booking_id'], retried.id)
+        self.assertTrue(Booking.objects.get(pk=retried.pk).is_paid)
+
+
+class BookingReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='owner', email='owner@example.com')
+        cls.slot, cls.other = (
+            ParkSlot.objects.create(price=10, owner=cls.user, address='x', description='x', type='Car')
+            for _ in range(2))
+        cls.ten = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    def reserve(self, slot, start, hours):
+        start_time = self.ten + timedelta(hours=start)
+        return reserve(slot.id, start_time, start_time + timedelta(hours=hours),
+                       user=self.user, duration=hours * 60, total_price=10)
+
+    def test_unpaid_checkout_holds_the_window(self):
+        self.assertIsNotNone(self.reserve(self.slot, 0, 2))
+        self.assertIsNone(self.reserve(self.slot, 1, 2))
+        self.assertIsNotNone(self.reserve(self.slot, 2, 1))
+        self.assertIsNotNone(self.reserve(self.other, 1, 2))
+        self.assertEqual(ParkSlot.objects.get(pk=self.slot.pk).reservation_version, 3)
+        self.assertFalse(double_booked(Booking.objects.all()).exists())
+
+    def test_failed_payment_frees_the_window(self):
+        booking = self.reserve(self.slot, 0, 2)
+        payment = Payment.objects.create(
+            user=self.user, amount=10, booking=booking, pidx='p1', payment_url='https://pay.example.com/')
+
+        apply_payment_status(payment, 'Failed', 'User canceled', None)
+        save_payment_status([payment])
+        self.assertFalse(Booking.objects.get(pk=booking.pk).is_active)
+        self.assertIsNotNone(self.reserve(self.slot, 1, 2))
+
+    def test_slot_detail_shows_open_checkouts(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.get(f'/api/parkslots/{self.slot.id}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.reserve(self.slot, 0, 2)
+        bookings = client.get(f'/api/parkslots/{self.slot.id}/').data['bookings']
+        self.assertEqual([(item['id'], item['booked']) for item in bookings], [(booking.id, False)])
+
+        payment = Payment.objects.create(
+            user=self.user, amount=10, booking=booking, pidx='p1', payment_url='https://pay.example.com/')
+        apply_payment_status(payment, 'Failed', 'User canceled', None)
+        with self.captureOnCommitCallbacks(execute=True):
+            save_payment_status([payment])
+        self.assertEqual(client.get(f'/api/parkslots/{self.slot.id}/').data['bookings'], [])
+
+    def test_reserve_many_is_all_or_nothing(self):
+        self.reserve(self.slot, 4, 1)
+        windows = [(self.slot, 0, 2), (self.other, 0, 2), (self.slot, 3, 2)]
+        bookings, conflicts = reserve_many([Booking(
+            slot=slot, user=self.user, start_time=self.ten + timedelta(hours=start),
+            end_time=self.ten + timedelta(hours=start + hours), duration=hours * 60, total_price=10)
+            for slot, start, hours in windows])
+        self.assertIsNone(bookings)
+        self.assertEqual(conflicts, [(self.slot.id, self.ten + timedelta(hours=3), self.ten + timedelta(hours=5))])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_bulk_payment_covers_every_booking(self):
+        bookings, _ = reserve_many([Booking(
+            slot=self.slot, user=self.user, start_time=start, end_time=start + timedelta(hours=1), duration=60,
+            total_price=10) for start, _ in expand(self.ten, self.ten + timedelta(hours=1), {
+                'frequency': 'weekly', 'weekdays': [0, 2, 4], 'count': 6}, 100)])
+        payment = Payment.objects.create(
+            user=self.user, amount=60, booking=bookings[0], pidx='p1', payment_url='https://pay.example.com/')
+        payment.bookings.add(*bookings)
+
+        apply_payment_status(payment, *fake_payment_status('p1'))
+        save_payment_status([payment])
+        self.assertEqual(Booking.objects.filter(booked=True, is_paid=True).count(), 6)
+
+    def test_recurrence(self):
+        monday = datetime(2030, 1, 7, 9, tzinfo=dt_timezone.utc)
+        windows = expand(monday, monday + timedelta(hours=8), {
+            'frequency': 'weekly', 'interval': 2, 'weekdays': [0, 4], 'until': '2030-01-31'}, 100)
+        self.assertEqual([start.day for start, _ in windows], [7, 11, 21, 25])
+        self.assertTrue(all(end - start == timedelta(hours=8) for start, end in windows))
+        self.assertEqual(len(expand(monday, monday + timedelta(hours=1), {'frequency': 'daily', 'count': 5}, 100)), 5)
+        with self.assertRaises(ValueError):
+            expand(monday, monday + timedelta(hours=1), {'frequency': 'daily', 'until': '2031-01-01'}, 100)
+
+    def test_empty_recurrence_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/book/bulk/', {
+            'park_slot_id': self.slot.id, 'start_time': '2031-01-10T10:00:00', 'end_time': '2031-01-10T11:00:00',
+            'recurrence': {'frequency': 'daily', 'until': '2031-01-01'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'The recurrence yields no bookings.')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_double_booked(self):
+        first, second = (Booking.objects.create(
+            slot=self.slot, user=self.user, start_time=self.ten + timedelta(hours=i),
+            end_time=self.ten + timedelta(hours=i + 2), total_price=10, duration=120) for i in range(2))
+        self.assertEqual(set(double_booked(Booking.objects.all())), {first, second})
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generate_data(self):
+        out = StringIO()
+        call_command('generate_data', '--users', '40', '--slots', '6', '--bookings-per-slot', '10',
+                     '--batch-size', '20', '--seed', '1', stdout=out)
+        self.assertIn('Created 40 users, 6 slots, 60 bookings, 60 payments', out.getvalue())
+        self.assertEqual((User.objects.count(), ParkSlot.objects.count(), Booking.objects.count()), (40, 6, 60))
+        self.assertEqual(User.objects.filter(role_type='provider').count(), 2)
+        self.assertTrue(User.objects.first().check_password('synthetic-pass'))
+
+        # consistent with what the app itself maintains
+        self.assertFalse(double_booked(Booking.objects.all()).exists())
+        self.assertFalse(Booking.objects.filter(is_paid=True).exclude(booking_payment__status='Success').exists())
+        ratings = Rating.objects.count()
+        self.assertEqual(sum(ParkSlot.objects.values_list('rating_count', flat=True)), ratings)
+        rollups = SlotDailyStats.objects.aggregate(bookings=Sum('bookings'))['bookings']
+        self.assertEqual(rollups, Booking.objects.filter(is_paid=True).count())
+
+        with self.assertRaises(CommandError):
+            call_command('generate_data', '--users', '0')
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+
+    def test_benchmark_report(self):
+        call_command('generate_data', '--users', '20', '--slots', '5', '--bookings-per-slot', '5', '--seed', '1',
+                     stdout=StringIO())
+        output = os.path.join(tempfile.mkdtemp(), 'run.bench.json')
+        out = StringIO()
+        call_command('benchmark', '--requests', '40', '--concurrency', '1', '--users', '5', '--seed', '1',
+                     '--gateway-latency-ms', '0', '--mix', 'list=1,retrieve=1,bookings=1,book=1,rate=1',
+                     '--output', output, stdout=out)
+        self.assertIn(f'Report written to {output}', out.getvalue())
+
+        with open(output) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report['benchmark'], 'benchmark')
+        self.assertEqual(report['dataset']['slots'], 5)
+        self.assertEqual(report['total']['requests'], 40)
+        self.assertEqual(report['total']['errors'], 0, report['endpoints'])
+        self.assertEqual(sum(endpoint['requests'] for endpoint in report['endpoints'].values()), 40)
+        for endpoint in report['endpoints'].values():
+            self.assertLessEqual(endpoint['latency_ms']['p50'], endpoint['latency_ms']['p99'])
+
+        with self.assertRaises(CommandError):
+            call_command('benchmark', '--mix', 'list=1,delete=1')
+
+
+class PaymentWorkerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create(username='owner', email='owner@example.com')
+        slot = ParkSlot.objects.create(price=10, owner=owner, address='x', description='x', type='Car')
+        booking = Booking.objects.create(
+            slot=slot, user=owner, start_time=timezone.now(), end_time=timezone.now() + timedelta(hours=1),
+            total_price=10, duration=60)
+        cls.payment = Payment.objects.create(
+            user=owner, amount=10, booking=booking, pidx='p1', payment_url='https://pay.example.com/')
+
+    def test_lease_has_one_holder(self):
+        first, second = Lease('test', 60), Lease('test', 60)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.acquire())
+
+        first.release()
+        self.assertTrue(second.acquire())
+        self.assertFalse(first.acquire())
+
+    @mock.patch.object(schedular, 'check_payment_status', fake_payment_status)
+    def test_only_the_lease_holder_reconciles(self):
+        other = Lease(LEASE_NAME, 60)
+        other.acquire()
+        call_command('run_payment_worker', '--once', stdout=StringIO())
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, 'Pending')
+
+        other.release()
+        call_command('run_payment_worker', '--once', stdout=StringIO())
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, 'Success')
+        self.assertTrue(other.acquire())
+
+    @override_settings(PAYMENT_CHECK_BACKOFF_SECONDS=60, PAYMENT_CHECK_MAX_BACKOFF_SECONDS=900)
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertEqual([next_check_delay(count).total_seconds() for count in range(6)], [60, 120, 240, 480, 900, 900])
+        self.assertEqual(next_check_delay(10 ** 6), timedelta(seconds=900))
+
+    @override_settings(PAYMENT_CHECK_BACKOFF_SECONDS=60, PAYMENT_CHECK_MAX_BACKOFF_SECONDS=900)
+    @mock.patch.object(schedular, 'check_payment_status', lambda pidx: ('Pending', 'Initiated', None))
+    def test_pending_payments_are_checked_less_often(self):
+        for check_count, delay in ((1, 120), (2, 240), (3, 480), (4, 900), (5, 900)):
+            before = timezone.now()
+            schedular.update_payment_status()
+            payment = Payment.objects.get(pk=self.payment.pk)
+            self.assertEqual(payment.check_count, check_count)
+            self.assertGreaterEqual(payment.next_check_at, before + timedelta(seconds=delay))
+            self.assertLessEqual(payment.next_check_at, timezone.now() + timedelta(seconds=delay))
+
+            # not due yet: another pass leaves it alone
+            schedular.update_payment_status()
+            self.assertEqual(Payment.objects.get(pk=self.payment.pk).check_count, check_count)
+            Payment.objects.filter(pk=self.payment.pk).update(next_check_at=timezone.now())
+
+    def expire(self, gateway_result):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Booking.objects.filter(pk=self.payment.booking_id).update(created_at=an_hour_ago)
+        Payment.objects.filter(pk=self.payment.pk).update(created_at=an_hour_ago)
+        with mock.patch.object(schedular, 'check_payment_status', lambda pidx: gateway_result):
+            return expire_checkouts()
+
+    def test_expired_checkout_fails_and_releases_booking(self):
+        self.assertEqual(self.expire(('Pending', 'Initiated', None)), (1, 0))
+        payment = Payment.objects.select_related('booking').get(pk=self.payment.pk)
+        self.assertEqual((payment.status, payment.gateway_status), ('Failed', 'Initiated'))
+        self.assertFalse(payment.booking.is_active)
+
+    def test_expired_checkout_paid_at_the_last_minute_is_kept(self):
+        self.assertEqual(self.expire(fake_payment_status('p1')), (1, 0))
+        payment = Payment.objects.select_related('booking').get(pk=self.payment.pk)
+        self.assertEqual(payment.status, 'Success')
+        self.assertTrue(payment.booking.is_active and payment.booking.is_paid)
+
+    def test_expired_checkout_waits_for_unreachable_gateway(self):
+        self.assertEqual(self.expire((None, None, None)), (0, 0))
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).status, 'Pending')
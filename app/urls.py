@@ -13,7 +13,16 @@ urlpatterns = [
     path('user/update/', views.UserUpdateView.as_view(), name='update user'),
     path('', include(router.urls)),
     path('book/', views.book_park_slot, name='book slot'),
+    path('book/bulk/', views.book_park_slots, name='bulk book slots'),
+    path('payment/verify/', views.verify_payment, name='verify payment'),
+    path('availability/', views.get_availability_of_park_slots, name='park slots availability'),
+    path('quote/', views.get_quotes_of_park_slots, name='park slots quotes'),
+    path('availability/<int:parkslot_id>/', views.get_free_windows_of_park_slot, name='free windows of park slot'),
     path('bookings/', views.get_bookings_of_user, name='my bookings'),
     path('parkslot/bookings/<int:parkslot_id>/', views.get_all_bookings_of_park_slot, name='all bookings of park slot'),
+    path('parkslot/bookings/<int:parkslot_id>/export/', views.export_bookings_of_park_slot,
+         name='export bookings of park slot'),
+    path('parkslot/analytics/<int:parkslot_id>/', views.get_analytics_of_park_slot, name='analytics of park slot'),
     path('rate/', views.rate_parkslot, name='rate park slot'),
+    path('cache/stats/', views.get_cache_stats, name='cache stats'),
 ]
@@ -1,15 +1,42 @@
-from django.db import IntegrityError
+import math
+from datetime import timedelta
+from adrf.decorators import api_view as async_api_view
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q
+from django.conf import settings
+from django.http import FileResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from django.utils.http import urlencode
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework import generics, viewsets
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import permission_classes, api_view
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.filters import OrderingFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.decorators import permission_classes, api_view, action, authentication_classes
 from app.models import ParkSlot, Booking, Payment, Rating
-from app.payment import create_payment_link
-from app.serializers import UserSerializer, ParkSlotSerializer
+from app.payment import acheck_payment_status, acreate_payment_link, apply_payment_status, save_payment_status
+from app.serializers import UserSerializer, ParkSlotSerializer, slot_list_data, slot_list_fields, slot_list_values
 from rest_framework_simplejwt.tokens import RefreshToken
 from app.services.api_response import generic_response, log_exception, log_field_error
+from app.services.analytics import slot_stats
+from app.services.availability import (
+    ahas_conflict, blocking_bookings, free_windows, overlap_each_other, reserve, reserve_many, slots_availability)
+from app.services.bookings import (
+    filter_bookings, ledger_page, ledger_rows, spool, stream_csv, stream_ndjson, with_booking_status)
+from app.services.async_views import AsyncGenericViewSet
+from app.services.authentication import user_cache
+from app.services.conditional import conditional, make_etag
+from app.services.custom_pagination import BookingCursorPagination
+from app.services.geo import covering_cells, degree_span, haversine_km
 from app.services.permission import IsOwner
+from app.services.pricing import quote, quote_many
+from app.services.recurrence import expand
+from app.services.search import ParkSlotSearchFilter
+from app.services.response_cache import cache_stats, cached_response, memoize
 from app.utils import format_datetime, get_char_uuid, parking_duration_hours
 from django.utils import timezone
 
@@ -120,31 +147,27 @@ class ParkSlotModelView(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
 
-        bookings = Booking.objects.filter(slot=instance, booked=True).order_by('-start_time')
-        data = []
-        for booking in bookings:
-            data.append({
-                'id': booking.id,
-                'user_email': booking.user.email,
-                'start_time': booking.start_time,
-                'end_time': booking.end_time,
-                'duration_minutes': booking.duration,
-                'total_price': booking.total_price,
-                'booked': booking.booked,
-                'is_paid': booking.is_paid,
-                'status': 'Booked' if booking.end_time > timezone.now() else 'Expired'
-            })
+        try:
+            data, paginator = ledger_page(instance, request)
+        except ValueError as e:
+            return generic_response(
+                success=False,
+                message=str(e),
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Add booking details to the response
+        # Add the first page of booking details to the response
         response = serializer.data
         response['bookings'] = data
+        response['bookings_next'] = paginator.get_next_link()
 
         return Response(response)
 
 
-class ParkSlotsModelView(viewsets.ModelViewSet):
+class ParkSlotsModelView(AsyncGenericViewSet):
     """
     View to list all park slots.
+    Async, so under ASGI the worker's event loop keeps serving while these wait on the database.
     For user.
     """
 
@@ -152,24 +175,78 @@ class ParkSlotsModelView(viewsets.ModelViewSet):
     serializer_class = ParkSlotSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ['get']
-    search_fields = ['address']
-    filterset_fields = {'status': ['exact'], 'price': ['exact'], 'address': ['icontains'], 'type': ['exact']}
+    filter_backends = [DjangoFilterBackend, ParkSlotSearchFilter, OrderingFilter]
+    search_fields = ['address', 'description']
+    filterset_fields = {'status': ['exact'], 'price': ['exact'], 'type': ['exact']}
+
+    def list_validators(self, request, *args, **kwargs):
+        def compute():
+            stats = self.filter_queryset(self.get_queryset()).aggregate(
+                last_modified=Max('updated_at'), count=Count('id'))
+            return make_etag(request, stats['last_modified'], stats['count']), stats['last_modified']
+        return memoize(request, 'validators', compute)
+
+    def retrieve_validators(self, request, *args, **kwargs):
+        def compute():
+            if not str(kwargs['pk']).isdigit():
+                return None, None
+            upcoming = Q(slot_booking__is_active=True, slot_booking__end_time__gt=timezone.now())
+            stats = ParkSlot.objects.filter(pk=kwargs['pk']).aggregate(
+                last_modified=Max('updated_at'), bookings_modified=Max('slot_booking__updated_at', filter=upcoming),
+                bookings=Count('slot_booking', filter=upcoming))
+            last_modified = max(filter(None, (stats['last_modified'], stats['bookings_modified'])), default=None)
+            return make_etag(request, *stats.values()), last_modified
+        return memoize(request, 'validators', compute)
+
+    @conditional(list_validators)
+    @cached_response
+    async def list(self, request, *args, **kwargs):
+        """
+        Slot listing. ?fields=id,coordinates,price,... selects the columns queried and returned,
+        e.g. for map pins; rows are serialized from values() without model instances.
+        With ?start_time=...&end_time=... every slot also gets the quoted_price of that window.
+        """
+        try:
+            fields = slot_list_fields(request.query_params.get('fields'))
+            window = quote_window(request.query_params)
+        except ValueError as e:
+            return generic_response(
+                success=False,
+                message=str(e),
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
+        # quoting needs the rate columns even when ?fields= leaves them out of the output
+        columns = fields + [field for field in ('id', 'price', 'rate_table') if window and field not in fields]
+
+        def page():
+            rows = self.paginate_queryset(slot_list_values(self.filter_queryset(self.get_queryset()), columns))
+            data = slot_list_data(rows, fields, request)
+            if window:
+                quotes = quote_many(((row['id'], row['price'], row['rate_table']) for row in rows), *window)
+                for row, item in zip(rows, data):
+                    item['quoted_price'] = quotes[row['id']]
+            return data
+
+        return self.get_paginated_response(await sync_to_async(page)())
+
+    @conditional(retrieve_validators)
+    @cached_response
+    async def retrieve(self, request, *args, **kwargs):
+        instance = await sync_to_async(self.get_object)()
         serializer = self.get_serializer(instance)
 
-        # Get bookings for this park slot
-        bookings = Booking.objects.filter(slot=instance, booked=True).order_by('-start_time')
+        # Upcoming windows that cannot be booked: paid bookings and checkouts still open (booked=False)
+        bookings = blocking_bookings().filter(slot=instance, end_time__gt=timezone.now()).order_by('-start_time')
         data = []
-        for booking in bookings:
-            if booking.end_time > timezone.now():
-                data.append({
-                    'id': booking.id,
-                    'start_time': booking.start_time,
-                    'end_time': booking.end_time,
-                    'duration_minutes': booking.duration,
-                })
+        async for booking in bookings.values('id', 'start_time', 'end_time', 'duration', 'booked'):
+            data.append({
+                'id': booking['id'],
+                'start_time': booking['start_time'],
+                'end_time': booking['end_time'],
+                'duration_minutes': booking['duration'],
+                'booked': booking['booked'],
+            })
 
         # Add booking details to the response
         response = serializer.data
@@ -177,12 +254,87 @@ class ParkSlotsModelView(viewsets.ModelViewSet):
 
         return Response(response)
 
+    @action(detail=False, methods=['get'])
+    @cached_response
+    async def nearby(self, request):
+        """
+        K-nearest park slots within radius (km) of lat/lng, sorted by distance.
+        Candidates come from the geohash cells covering the circle instead of the whole table.
+        """
+        try:
+            try:
+                lat = float(request.query_params['lat'])
+                lng = float(request.query_params['lng'])
+                radius = float(request.query_params.get('radius', 2))
+                limit = min(int(request.query_params.get('limit', 20)), 100)
+                min_price = request.query_params.get('min_price')
+                max_price = request.query_params.get('max_price')
+                min_price = float(min_price) if min_price else None
+                max_price = float(max_price) if max_price else None
+            except (KeyError, ValueError):
+                return generic_response(
+                    success=False,
+                    message='Please provide valid lat, lng, radius and limit.',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # float() also accepts 'nan' (False in every comparison) and 'inf'
+            finite = all(math.isfinite(value) for value in (radius, min_price, max_price) if value is not None)
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not finite or radius <= 0 or limit <= 0:
+                return generic_response(
+                    success=False,
+                    message='Please provide valid lat, lng, radius and limit.',
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            radius = min(radius, 50)
+
+            # each cell is a contiguous key range of the geohash index
+            cells = Q()
+            for cell in covering_cells(lat, lng, radius):
+                cells |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+
+            lat_span, lng_span = degree_span(lat, radius)
+            slots = ParkSlot.objects.filter(cells, latitude__range=(lat - lat_span, lat + lat_span))
+            if lng_span < 180 and -180 <= lng - lng_span and lng + lng_span <= 180:
+                slots = slots.filter(longitude__range=(lng - lng_span, lng + lng_span))
+            if request.query_params.get('type'):
+                slots = slots.filter(type=request.query_params['type'])
+            if min_price is not None:
+                slots = slots.filter(price__gte=min_price)
+            if max_price is not None:
+                slots = slots.filter(price__lte=max_price)
+
+            nearest = []
+            async for slot in slots:
+                distance = haversine_km(lat, lng, slot.latitude, slot.longitude)
+                if distance <= radius:
+                    nearest.append((distance, slot))
+            nearest.sort(key=lambda item: item[0])
+            nearest = nearest[:limit]
+
+            serializer = self.get_serializer([slot for _, slot in nearest], many=True)
+            data = serializer.data
+            for item, (distance, _) in zip(data, nearest):
+                item['distance_km'] = round(distance, 3)
+
+            return generic_response(
+                success=True,
+                message='Nearby Park Slots',
+                data=data,
+                status=status.HTTP_200_OK
+            )
+
+        except Exception as e:
+            print(e)
+            return log_exception(e)
 
-@api_view(['POST', 'OPTIONS'])
+
+@async_api_view(['POST', 'OPTIONS'])
 @permission_classes([IsAuthenticated])
-def book_park_slot(request):
+async def book_park_slot(request):
     """
     Book a park slot.
+    Async: while Khalti creates the payment link the worker serves other requests.
     For user.
     """
     user = request.user
@@ -203,7 +355,7 @@ def book_park_slot(request):
         end_time = format_datetime(end_time)
 
         try:
-            slot = ParkSlot.objects.get(id=park_slot_id)
+            slot = await ParkSlot.objects.aget(id=park_slot_id)
         except ParkSlot.DoesNotExist:
             return generic_response(
                 success=False,
@@ -211,8 +363,8 @@ def book_park_slot(request):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if Booking.objects.filter(
-                slot=slot, start_time__lt=end_time, end_time__gt=start_time, booked=True).exists():
+        # cheap early rejection; reserve() repeats the check under the slot's row lock
+        if await ahas_conflict(slot.id, start_time, end_time):
             return generic_response(
                 success=False,
                 message='Slot is already booked for the selected time range.',
@@ -220,28 +372,35 @@ def book_park_slot(request):
             )
 
         duration_hours = parking_duration_hours(start_time, end_time)
-        total_price = max(round(duration_hours * slot.price, 2), 10)
+        total_price = quote(slot.price, slot.rate_table, start_time, end_time)
 
-        booking = Booking.objects.create(
-            slot=slot,
+        booking = await sync_to_async(reserve)(
+            slot.id,
+            start_time,
+            end_time,
             user=user,
-            start_time=start_time,
-            end_time=end_time,
             duration=round(duration_hours * 60),
             total_price=total_price,
         )
+        if booking is None:
+            return generic_response(
+                success=False,
+                message='Slot is already booked for the selected time range.',
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         order_id = get_char_uuid(16)
-        response = create_payment_link(total_price, booking.id, order_id)
+        return_url = settings.KHALTI_RETURN_URL or request.build_absolute_uri(reverse('verify payment'))
+        response = await acreate_payment_link(total_price, booking.id, order_id, return_url)
         if not response:
-            booking.delete()
+            await Booking.objects.filter(pk=booking.pk).adelete()
             return generic_response(
                 success=False,
                 message='Failed to create payment link.',
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        Payment.objects.create(
+        await Payment.objects.acreate(
             user=user,
             amount=total_price,
             booking=booking,
@@ -266,30 +425,384 @@ def book_park_slot(request):
         return log_exception(e)
 
 
+def bulk_booking_windows(data):
+    """
+    (slot_id, start_time, end_time) windows of a bulk booking request: either a list of bookings,
+    or one booking and a recurrence (see app.services.recurrence.expand).
+    Raises ValueError with a message for the user.
+    """
+    limit = settings.BULK_BOOKING_MAX_WINDOWS
+    try:
+        if data.get('recurrence') is None:
+            items = data['bookings']
+            if not isinstance(items, list) or not items or len(items) > limit:
+                raise ValueError
+            windows = [(int(item['park_slot_id']), format_datetime(item['start_time']),
+                        format_datetime(item['end_time'])) for item in items]
+        else:
+            windows = [(int(data['park_slot_id']), format_datetime(data['start_time']),
+                        format_datetime(data['end_time']))]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f'Please provide up to {limit} bookings with park_slot_id, start_time and end_time, '
+                         f'or one booking and a recurrence.')
+
+    if any(start_time >= end_time for _, start_time, end_time in windows):
+        raise ValueError('Every start_time must be before its end_time.')
+    if data.get('recurrence') is not None:
+        slot_id, start_time, end_time = windows[0]
+        windows = [(slot_id, start, end) for start, end in expand(start_time, end_time, data['recurrence'], limit)]
+        if not windows:
+            raise ValueError('The recurrence yields no bookings.')
+    if overlap_each_other(windows):
+        raise ValueError('The requested bookings overlap each other.')
+    return windows
+
+
+@async_api_view(['POST', 'OPTIONS'])
+@permission_classes([IsAuthenticated])
+async def book_park_slots(request):
+    """
+    Book many windows in one checkout: a list of slots and windows (fleets), or one window
+    repeated by a recurrence (commuters). Either every window is reserved or none is,
+    and a single payment link covers them all.
+    For user.
+    """
+    user = request.user
+
+    try:
+        try:
+            windows = bulk_booking_windows(request.data)
+        except ValueError as e:
+            return generic_response(
+                success=False,
+                message=str(e),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        slot_ids = {slot_id for slot_id, _, _ in windows}
+        slots = ParkSlot.objects.filter(id__in=slot_ids).values_list('id', 'price', 'rate_table')
+        rates = {slot_id: (price, rate_table) async for slot_id, price, rate_table in slots}
+        if len(rates) != len(slot_ids):
+            return generic_response(
+                success=False,
+                message='Park Slot not found.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        bookings = []
+        for slot_id, start_time, end_time in windows:
+            duration_hours = parking_duration_hours(start_time, end_time)
+            bookings.append(Booking(
+                slot_id=slot_id,
+                user=user,
+                start_time=start_time,
+                end_time=end_time,
+                duration=round(duration_hours * 60),
+                total_price=quote(*rates[slot_id], start_time, end_time),
+            ))
+
+        bookings, conflicts = await sync_to_async(reserve_many)(bookings)
+        if bookings is None:
+            return generic_response(
+                success=False,
+                message='Slot is already booked for some of the selected time ranges.',
+                data={'conflicts': [
+                    {'park_slot_id': slot_id, 'start_time': start_time, 'end_time': end_time}
+                    for slot_id, start_time, end_time in conflicts
+                ]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        total_price = round(sum(booking.total_price for booking in bookings), 2)
+        booking_ids = [booking.id for booking in bookings]
+        order_id = get_char_uuid(16)
+        return_url = settings.KHALTI_RETURN_URL or request.build_absolute_uri(reverse('verify payment'))
+        response = await acreate_payment_link(total_price, booking_ids[0], order_id, return_url)
+        if not response:
+            await Booking.objects.filter(pk__in=booking_ids).adelete()
+            return generic_response(
+                success=False,
+                message='Failed to create payment link.',
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        @sync_to_async
+        def create_payment():
+            with transaction.atomic():
+                payment = Payment.objects.create(
+                    user=user,
+                    amount=total_price,
+                    booking=bookings[0],
+                    pidx=response.get('pidx'),
+                    payment_url=response.get('payment_url'),
+                )
+                payment.bookings.add(*bookings)
+
+        await create_payment()
+
+        return generic_response(
+            success=True,
+            message='Slots Booked Successfully',
+            data={
+                'booking_ids': booking_ids,
+                'total_price': total_price,
+                'payment_url': response.get('payment_url')
+            },
+            status=status.HTTP_200_OK
+        )
+
+    except Exception as e:
+        print(e)
+        return log_exception(e)
+
+
+@async_api_view(['GET', 'POST'])
+@authentication_classes([])
+@permission_classes([])
+async def verify_payment(request):
+    """
+    Payment return URL.
+    Khalti redirects the user here with the pidx after checkout; the status is looked up
+    from the gateway (query params are not trusted) and the booking is confirmed right away.
+    """
+    try:
+        pidx = request.query_params.get('pidx') or request.data.get('pidx')
+        if not pidx:
+            return generic_response(
+                success=False,
+                message='Please provide pidx.',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # pidx is not unique: a retried checkout may have recorded it twice, the latest payment wins
+        payment = await Payment.objects.filter(pidx=pidx).order_by('-id').afirst()
+        if payment is None:
+            return generic_response(
+                success=False,
+                message='Payment not found.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if payment.status == 'Pending':
+            payment_status, gateway_status, txn_id = await acheck_payment_status(pidx)
+            if apply_payment_status(payment, payment_status, gateway_status, txn_id):
+                if not await sync_to_async(save_payment_status)([payment]):
+                    # settled meanwhile by the scheduler
+                    await sync_to_async(payment.refresh_from_db)(fields=['status', 'gateway_status', 'transaction_id'])
+
+        data = {
+            'booking_id': payment.booking_id,
+            'payment_status': payment.status,
+            'is_paid': payment.status == 'Success',
+        }
+        if settings.PAYMENT_COMPLETE_REDIRECT_URL and request.method == 'GET':
+            return redirect(f"{settings.PAYMENT_COMPLETE_REDIRECT_URL}?{urlencode(data)}")
+
+        return generic_response(
+            success=True,
+            message='Payment Status',
+            data=data,
+            status=status.HTTP_200_OK
+        )
+
+    except Exception as e:
+        print(e)
+        return log_exception(e)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_availability_of_park_slots(request):
+    """
+    Which of the given park slots are free for a time window.
+    For user.
+    """
+    try:
+        try:
+            slot_ids = [int(slot_id) for slot_id in request.query_params.get('slot_ids', '').split(',') if slot_id]
+            start_time = format_datetime(request.query_params.get('start_time', ''))
+            end_time = format_datetime(request.query_params.get('end_time', ''))
+        except ValueError:
+            slot_ids = None
+
+        if not slot_ids or len(slot_ids) > 100 or start_time >= end_time:
+            return generic_response(
+                success=False,
+                message='Please provide up to 100 slot_ids and a valid start_time and end_time.',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        availability = slots_availability(slot_ids, start_time, end_time)
+        return generic_response(
+            success=True,
+            message='Park Slots Availability',
+            data={
+                'start_time': start_time,
+                'end_time': end_time,
+                'free': [slot_id for slot_id in slot_ids if availability.get(slot_id) is True],
+                'booked': [slot_id for slot_id in slot_ids if availability.get(slot_id) is False],
+            },
+            status=status.HTTP_200_OK
+        )
+
+    except Exception as e:
+        print(e)
+        return log_exception(e)
+
+
+def quote_window(params):
+    """
+    (start_time, end_time) of the optional start_time/end_time query params, or None without them.
+    Raises ValueError with a message for the user.
+    """
+    if not params.get('start_time') and not params.get('end_time'):
+        return None
+    message = 'Please provide a valid start_time and end_time at most 31 days apart.'
+    try:
+        start_time = format_datetime(params.get('start_time', ''))
+        end_time = format_datetime(params.get('end_time', ''))
+    except ValueError:
+        raise ValueError(message)
+    if start_time >= end_time or end_time - start_time > timedelta(days=31):
+        raise ValueError(message)
+    return start_time, end_time
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_bookings_of_user(request):
+def get_quotes_of_park_slots(request):
     """
-    Get all bookings of a user.
+    Price of one time window at each of the given park slots, as booking it would charge.
+    For user.
+    """
+    try:
+        try:
+            slot_ids = [int(slot_id) for slot_id in request.query_params.get('slot_ids', '').split(',') if slot_id]
+            window = quote_window(request.query_params)
+        except ValueError:
+            slot_ids = window = None
+
+        if not slot_ids or len(slot_ids) > 100 or not window:
+            return generic_response(
+                success=False,
+                message='Please provide up to 100 slot_ids and a valid start_time and end_time at most 31 days apart.',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start_time, end_time = window
+        quotes = quote_many(
+            ParkSlot.objects.filter(id__in=slot_ids).values_list('id', 'price', 'rate_table'), start_time, end_time)
+        return generic_response(
+            success=True,
+            message='Park Slots Quotes',
+            data={
+                'start_time': start_time,
+                'end_time': end_time,
+                'duration_minutes': round(parking_duration_hours(start_time, end_time) * 60),
+                'quotes': [
+                    {'slot_id': slot_id, 'total_price': quotes[slot_id]} for slot_id in slot_ids if slot_id in quotes
+                ],
+            },
+            status=status.HTTP_200_OK
+        )
+
+    except Exception as e:
+        print(e)
+        return log_exception(e)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_free_windows_of_park_slot(request, parkslot_id):
+    """
+    Free time windows of a park slot between start_time and end_time.
+    For user.
+    """
+    try:
+        try:
+            start_time = format_datetime(request.query_params.get('start_time', ''))
+            end_time = format_datetime(request.query_params.get('end_time', ''))
+        except ValueError:
+            start_time = end_time = None
+
+        if not start_time or start_time >= end_time or end_time - start_time > timedelta(days=31):
+            return generic_response(
+                success=False,
+                message='Please provide a valid start_time and end_time at most 31 days apart.',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not ParkSlot.objects.filter(id=parkslot_id).exists():
+            return generic_response(
+                success=False,
+                message='Park Slot not found.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        windows = free_windows(parkslot_id, start_time, end_time)
+        return generic_response(
+            success=True,
+            message='Free Windows of Park Slot',
+            data=[{'start_time': start, 'end_time': end} for start, end in windows],
+            status=status.HTTP_200_OK
+        )
+
+    except Exception as e:
+        print(e)
+        return log_exception(e)
+
+
+def bookings_of_user_validators(request):
+    """
+    Validators of the bookings feed: booking and slot changes, and bookings turning Expired.
+    """
+    try:
+        bookings = filter_bookings(Booking.objects.filter(user=request.user, booked=True), request.query_params)
+    except ValueError:
+        return None, None
+
+    stats = bookings.aggregate(
+        last_modified=Max('updated_at'), slots_modified=Max('slot__updated_at'), count=Count('id'),
+        active=Count('id', filter=Q(end_time__gt=timezone.now())))
+    last_modified = max(filter(None, (stats['last_modified'], stats['slots_modified'])), default=None)
+    return make_etag(request, *stats.values()), last_modified
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional(bookings_of_user_validators)
+async def get_bookings_of_user(request):
+    """
+    Get bookings of a user, newest first, cursor paginated.
+    Optional filters: status (Booked/Expired), from_date and to_date (YYYY-MM-DD).
     For user.
     """
     user = request.user
 
     try:
-        bookings = Booking.objects.filter(user=user, booked=True).order_by('-start_time')
-        data = []
-        for booking in bookings:
-            booking_status = 'Booked' if booking.end_time > timezone.now() else 'Expired'
+        try:
+            bookings = filter_bookings(Booking.objects.filter(user=user, booked=True), request.query_params)
+        except ValueError as e:
+            return generic_response(
+                success=False,
+                message=str(e),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bookings = with_booking_status(bookings.select_related('slot'))
+        paginator = BookingCursorPagination()
+        page = await sync_to_async(paginator.paginate_queryset)(bookings, request)
 
-            rating = None
-            if booking_status == 'Expired':
-                rating_objs = Rating.objects.filter(slot=booking.slot, user=user)
-                if rating_objs.exists():
-                    rating = rating_objs.first().rating
+        expired_slots = {booking.slot_id for booking in page if booking.booking_status == 'Expired'}
+        ratings = {
+            slot_id: rating async for slot_id, rating in
+            Rating.objects.filter(user=user, slot_id__in=expired_slots).values_list('slot_id', 'rating')}
 
+        data = []
+        for booking in page:
             data.append({
                 'id': booking.id,
-                'slot_id': booking.slot.id,
+                'slot_id': booking.slot_id,
                 'parking_address': booking.slot.address,
                 'parking_coordinate': booking.slot.coordinates,
                 'vehicle_type': booking.slot.type,
@@ -299,15 +812,16 @@ def get_bookings_of_user(request):
                 'total_price': booking.total_price,
                 'booked': booking.booked,
                 'is_paid': booking.is_paid,
-                'status': booking_status,
-                'rating': rating
+                'status': booking.booking_status,
+                'rating': ratings.get(booking.slot_id) if booking.booking_status == 'Expired' else None
             })
 
         return generic_response(
             success=True,
             message='Bookings',
             data=data,
-            status=status.HTTP_200_OK
+            status=status.HTTP_200_OK,
+            additional_data={'next': paginator.get_next_link(), 'previous': paginator.get_previous_link()}
         )
 
     except Exception as e:
@@ -334,39 +848,141 @@ def get_all_bookings_of_park_slot(request, parkslot_id):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if slot.owner != user:
+        if slot.owner_id != user.id:
             return generic_response(
                 success=False,
                 message='You are not the owner of this park slot.',
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        bookings = Booking.objects.filter(slot=slot, booked=True).order_by('-start_time')
-        data = []
-        for booking in bookings:
-
-            rating = None
-            rating_objs = Rating.objects.filter(slot=booking.slot)
-            if rating_objs.exists():
-                rating = rating_objs.first().rating
-
-            data.append({
-                'id': booking.id,
-                'user_email': booking.user.email,
-                'start_time': booking.start_time,
-                'end_time': booking.end_time,
-                'duration_minutes': booking.duration,
-                'total_price': booking.total_price,
-                'booked': booking.booked,
-                'is_paid': booking.is_paid,
-                'status': 'Booked' if booking.end_time > timezone.now() else 'Expired',
-                'rating': rating
-            })
+        try:
+            data, paginator = ledger_page(slot, request)
+        except ValueError as e:
+            return generic_response(
+                success=False,
+                message=str(e),
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         return generic_response(
             success=True,
             message='All Bookings of Park Slot',
             data=data,
+            status=status.HTTP_200_OK,
+            additional_data={'next': paginator.get_next_link(), 'previous': paginator.get_previous_link()}
+        )
+
+    except Exception as e:
+        print(e)
+        return log_exception(e)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_bookings_of_park_slot(request, parkslot_id):
+    """
+    Every booking of a park slot as CSV or NDJSON (export_format=csv|ndjson), spooled and then streamed.
+    Accepts the same status/from_date/to_date filters as the ledger.
+    For owner of the park slot.
+    """
+    user = request.user
+
+    try:
+        try:
+            slot = ParkSlot.objects.get(id=parkslot_id)
+        except ParkSlot.DoesNotExist:
+            return generic_response(
+                success=False,
+                message='Park Slot not found.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if slot.owner_id != user.id:
+            return generic_response(
+                success=False,
+                message='You are not the owner of this park slot.',
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            return generic_response(
+                success=False,
+                message='export_format should be csv or ndjson.',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            rows = ledger_rows(slot, request.query_params)
+        except ValueError as e:
+            return generic_response(
+                success=False,
+                message=str(e),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if export_format == 'csv':
+            response = FileResponse(spool(stream_csv(rows)), content_type='text/csv')
+        else:
+            response = FileResponse(spool(stream_ndjson(rows)), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="parkslot-{slot.id}-bookings.{export_format}"'
+        return response
+
+    except Exception as e:
+        print(e)
+        return log_exception(e)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_analytics_of_park_slot(request, parkslot_id):
+    """
+    Occupancy rate, revenue and average duration of a park slot per day or week (period=day|week).
+    Defaults to the last 30 days; from_date and to_date (YYYY-MM-DD) select up to 366 days.
+    For owner of the park slot.
+    """
+    user = request.user
+
+    try:
+        try:
+            slot = ParkSlot.objects.get(id=parkslot_id)
+        except ParkSlot.DoesNotExist:
+            return generic_response(
+                success=False,
+                message='Park Slot not found.',
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if slot.owner_id != user.id:
+            return generic_response(
+                success=False,
+                message='You are not the owner of this park slot.',
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        params = request.query_params
+        period = params.get('period', 'day')
+        try:
+            # parse_date returns None for malformed dates and raises for impossible ones like 2030-02-30
+            to_date = parse_date(params['to_date']) if params.get('to_date') else timezone.localdate()
+            from_date = parse_date(params['from_date']) if params.get('from_date') else None
+            if to_date and not params.get('from_date'):
+                from_date = to_date - timedelta(days=29)
+        except ValueError:
+            from_date = to_date = None
+
+        if period not in ('day', 'week') or not from_date or not to_date \
+                or not (0 <= (to_date - from_date).days < 366):
+            return generic_response(
+                success=False,
+                message='Please provide period (day or week) and from_date/to_date at most 366 days apart.',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return generic_response(
+            success=True,
+            message='Park Slot Analytics',
+            data=slot_stats(slot, from_date, to_date, period),
             status=status.HTTP_200_OK
         )
 
@@ -375,6 +991,21 @@ def get_all_bookings_of_park_slot(request, parkslot_id):
         return log_exception(e)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_cache_stats(request):
+    """
+    Hit/miss counters of the park slot response cache, and of this process's authenticated user cache.
+    For admin.
+    """
+    return generic_response(
+        success=True,
+        message='Cache Stats',
+        data={**cache_stats(), 'authentication': user_cache.stats()},
+        status=status.HTTP_200_OK
+    )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def rate_parkslot(request):
@@ -412,11 +1043,13 @@ def rate_parkslot(request):
             )
 
         try:
-            Rating.objects.create(
-                rating=rating,
-                slot=booking.slot,
-                user=user
-            )
+            # rating row and slot aggregates are committed together
+            with transaction.atomic():
+                Rating.objects.create(
+                    rating=rating,
+                    slot_id=booking.slot_id,
+                    user=user
+                )
         except IntegrityError:
             return generic_response(
                 success=False,
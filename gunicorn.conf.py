@@ -0,0 +1,27 @@
+"""
+Production server: gunicorn managing uvicorn workers that serve parkO/asgi.py.
+
+    gunicorn -c gunicorn.conf.py
+
+Async views (slot reads, user bookings, booking and payment verification) wait on the database
+and the payment gateway without holding a thread, so a worker keeps many requests in flight.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'parkO.asgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+# One event loop per worker. Sync views (login, register, rating, ...) and the ORM calls of async views
+# all run on a single thread per worker (sync_to_async is thread sensitive), so a worker waits on one
+# query at a time. With SQLite or a local database that work is CPU bound and more workers than CPUs
+# only add contention (1 CPU, benchmark mix: 45 req/s with 1 worker, 34 req/s with 3). With a
+# database across the network, raise WEB_CONCURRENCY (e.g. 2 * CPUs + 1) so sync views overlap.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
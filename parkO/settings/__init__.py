@@ -13,7 +13,11 @@ from .base import *
 from .apps import *
 from .auth import *
 from .database import *
+from .cache import *
 from .drf import *
 from .middleware import *
 from .template import *
 from .cors import *
+from .payment import *
+from .images import *
+from .media import *
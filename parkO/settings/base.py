@@ -70,11 +70,17 @@ AUTH_USER_MODEL = 'app.User'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# EmailAndUsernameBackend already matches usernames, a ModelBackend fallback would only hash
+# the password a second time for every failed login
 AUTHENTICATION_BACKENDS = [
     'app.backends.EmailAndUsernameBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
 
 KHALTI_BASE_URL = os.environ.get("KHALTI_BASE_URL")
 KHALTI_SECRET_KEY = os.environ.get("KHALTI_SECRET_KEY")
+KHALTI_WEBSITE_URL = os.environ.get("KHALTI_WEBSITE_URL", "https://localhost:3000")
+# where Khalti sends the user after checkout; defaults to the payment verify endpoint of the current host
+KHALTI_RETURN_URL = os.environ.get("KHALTI_RETURN_URL")
+# optional frontend page the verify endpoint redirects to, with booking_id and status query params
+PAYMENT_COMPLETE_REDIRECT_URL = os.environ.get("PAYMENT_COMPLETE_REDIRECT_URL")
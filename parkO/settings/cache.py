@@ -0,0 +1,29 @@
+import os
+
+from .base import BASE_DIR
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+#
+# locmem is per process. When running several workers, or the web service next to run_payment_worker,
+# set CACHE_DIR so they share a file based cache and see each other's invalidations; with locmem a
+# payment settled by the worker only shows in slot responses once RESPONSE_CACHE_TIMEOUT has passed.
+
+if os.environ.get("CACHE_DIR"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, os.environ.get("CACHE_DIR")),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'parko',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# seconds a cached park slot listing page may be served; writes invalidate it earlier
+RESPONSE_CACHE_TIMEOUT = 60
@@ -1,9 +1,12 @@
 from datetime import timedelta
+from importlib.util import find_spec
+
+from .base import DEBUG
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'app.services.custom_pagination.CustomPageNumberPagination',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.services.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -11,8 +14,11 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'app.services.renderers.ORJSONRenderer',
+        # Accept: application/msgpack or ?format=msgpack, when msgpack is installed
+        *(['app.services.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        # the HTML API browser only while developing
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     ],
     'PAGE_SIZE': 50
 }
@@ -20,3 +26,8 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=30),
 }
+
+# authenticated users are cached per process (app.services.authentication.user_cache);
+# a user changed in another process is seen by this one after at most the TTL
+AUTH_USER_CACHE_TTL_SECONDS = 60
+AUTH_USER_CACHE_MAX_ENTRIES = 10000
@@ -0,0 +1,14 @@
+# Uploaded pictures (app/services/images.py)
+
+# variants rendered from every slot and profile picture: name -> longest edge in pixels
+IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1600,
+}
+
+# WEBP when Pillow supports it, JPEG otherwise
+IMAGE_VARIANT_QUALITY = 80
+
+# processes rendering variants, per web worker; uploads only queue work for them
+IMAGE_PROCESSING_WORKERS = 2
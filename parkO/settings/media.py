@@ -0,0 +1,20 @@
+import os
+
+# Media storage and delivery (app/services/storage.py, app/services/media.py)
+
+# uploads are stored under the SHA-256 of their content, so identical files are kept once
+# and every stored name can be cached forever
+DEFAULT_FILE_STORAGE = 'app.services.storage.ContentAddressedStorage'
+
+# how media is sent by app.services.media.serve:
+#   django      the app streams the file itself (development, or no front server)
+#   x-accel     nginx sends it from the internal location MEDIA_ACCEL_PREFIX
+#   x-sendfile  Apache mod_xsendfile / lighttpd send it from its absolute path
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Cache-Control max-age of media whose name is not content-addressed (uploaded before it was)
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
+# booking exports are spooled before they are sent; larger ones spill from memory to a temporary file
+EXPORT_SPOOL_MAX_BYTES = 5 * 1024 * 1024
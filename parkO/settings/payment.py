@@ -0,0 +1,33 @@
+
+# Payment reconciliation (app/schedular.py, run by manage.py run_payment_worker)
+
+# (connect, read) timeout in seconds for every Khalti request
+PAYMENT_GATEWAY_TIMEOUT = (3.05, 10)
+
+# open connections per worker process for async gateway calls (app.payment.acreate_payment_link);
+# further in-flight calls wait for a free connection
+PAYMENT_GATEWAY_MAX_CONNECTIONS = 100
+
+# payments are confirmed by the return URL callback (app.views.verify_payment);
+# polling is only a safety net for checkouts that never come back
+PAYMENT_RECONCILE_INTERVAL_SECONDS = 30
+PAYMENT_RECONCILE_BATCH_SIZE = 100
+PAYMENT_RECONCILE_WORKERS = 8
+
+# Khalti payment links expire 30 minutes after initiation; once this TTL has passed the payment
+# worker does a final status check, fails the payment and releases the unpaid booking
+CHECKOUT_TTL_SECONDS = 35 * 60
+
+# no booking costs less than this, whatever its rate table says (app.services.pricing)
+BOOKING_MINIMUM_PRICE = 10
+
+# one bulk or recurring checkout (app.views.book_park_slots) pays for at most this many bookings
+BULK_BOOKING_MAX_WINDOWS = 100
+
+# only the worker instance holding this lease reconciles; it renews every third of the lease
+# and a standby takes over at most this many seconds after the holder dies
+PAYMENT_WORKER_LEASE_SECONDS = 15
+
+# a pending payment is re-checked after base * 2^checks seconds, capped at max
+PAYMENT_CHECK_BACKOFF_SECONDS = 60
+PAYMENT_CHECK_MAX_BACKOFF_SECONDS = 900